@@ -90,6 +90,14 @@ if '__main__' == __name__:
              "this will only work if and experimental data file was given",
         action='store_true'
     )
+    parser.add_argument(
+        "--stats_tolerance",
+        help="Stop drawing bootstrap samples for the statistics once the standard error of the confidence bounds "
+             "is below this value, at most 100000 samples are drawn",
+        metavar='FLOAT',
+        type=float,
+        default=None
+    )
     parser.add_argument(
         "--comments",
         help="Identifier used to mark comments in the input network files",
@@ -114,6 +122,41 @@ if '__main__' == __name__:
         metavar='BOOLEAN',
         default='True'
     )
+    parser.add_argument(
+        "--method",
+        help="Use 'paths' to average over all paths in the network or 'mle' for a weighted least-squares "
+             "estimate of all free energies at once, which is much faster for large networks with many cycles",
+        choices=['paths', 'mle'],
+        default='paths'
+    )
+    parser.add_argument(
+        "--max_path_length",
+        help="Only average over paths with at most this many perturbations, compounds further away from the "
+             "target compound are left out",
+        metavar='INTEGER',
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--k_best_paths",
+        help="Only average over the k paths with the lowest error to each compound",
+        metavar='INTEGER',
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--jobs",
+        help="Number of processes used to read the network files and to solve disconnected parts of the network",
+        metavar='INTEGER',
+        type=int,
+        default=1
+    )
+    parser.add_argument(
+        "--cache_dir",
+        help="Directory in which parsed network files are cached, unchanged files are not parsed again on later runs",
+        metavar='DIRECTORY',
+        default=None
+    )
     parser.add_argument(
         "--generate_notebook",
         help="Autogenerates a jupyter notebook showing the working of the anaysis and useful plots. "
@@ -140,6 +183,8 @@ if '__main__' == __name__:
                 "\n\n################# NETWORKANALYSIS v. %s WITH NETWORKX ################################" % networkanalysis.__version__)
     print ("\n\n########################## Parameters ######################################")
     print ("filelist: \t\t\t\t%s" % args.files)
+    print ("parallel jobs: \t\t\t\t%s" % args.jobs)
+    print ("cache directory: \t\t\t%s" % args.cache_dir)
     print ("file comment: \t\t\t\t%s" % args.comments)
     print ("file delimiter: \t\t\t%s" % args.delimiter)
     print ("target compound: \t\t\t%s" % args.target_compound)
@@ -148,23 +193,30 @@ if '__main__' == __name__:
     print ("IC50s datafile: \t\t\t%s" % args.experiments)
     print ("Weidghted averages:\t\t\t%s" % args.weighted)
     print ("Merge binding modes:\t\t\t%s" % args.merge_BM)
+    print ("Free energy method:\t\t\t%s" % args.method)
+    print ("Maximum path length:\t\t\t%s" % args.max_path_length)
+    print ("k best paths:\t\t\t\t%s" % args.k_best_paths)
     print ("#############################################################################\n\n")
 
     # Do the network analysis
-    pG = PerturbationGraph()
-    pG.populate_pert_graph(args.files[0], delimiter=args.delimiter, comments=args.comments)
+    pG = PerturbationGraph(cache_dir=args.cache_dir)
     if len(args.files) > 1:
-        for f in args.files[1:]:
-            pG.add_data_to_graph(f, delimiter=args.delimiter, comments=args.comments)
+        pG.populate_from_files(args.files, delimiter=args.delimiter, comments=args.comments, jobs=args.jobs)
+    else:
+        pG.populate_pert_graph(args.files[0], delimiter=args.delimiter, comments=args.comments)
     target_compound = args.target_compound
     if target_compound == None:
         target_compound = list(pG.graph.nodes)[0]
         warnings.warn(
             UserWarning("No target compound given, using the first compound in the node list: %s" % target_compound))
     if args.weighted == False:
-        pG.compute_avg_paths(target_compound)
+        pG.compute_average_paths(target_compound, max_length=args.max_path_length, k_best=args.k_best_paths)
     else:
-        pG.compute_weighted_avg_paths(target_compound)
+        pG.compute_weighted_avg_paths(target_compound, method=args.method, max_length=args.max_path_length,
+                                      k_best=args.k_best_paths, n_jobs=args.jobs)
+        if len(pG.componentReferences) > 1:
+            print ("connected components: \t\t\t%d, references %s" % (len(pG.componentReferences),
+                                                                     pG.componentReferences))
     pG.format_free_energies(merge_BM=args.merge_BM, intermed_ID=args.intermed_ID, weighted=args.weighted)
     comp_DDG = pG.freeEnergyInKcal
 
@@ -179,13 +231,17 @@ if '__main__' == __name__:
         ex.compute_DDG_from_IC50s(args.experiments, reference=target_compound)
         exp_DDG = ex.freeEnergiesInKcal
         stats = freeEnergyStats()
-        stats.generate_statistics(comp_DDG, exp_DDG, repeats=1000)
+        if args.stats_tolerance is None:
+            stats.generate_statistics(comp_DDG, exp_DDG, repeats=1000)
+        else:
+            stats.generate_statistics(comp_DDG, exp_DDG, repeats=100000, tolerance=args.stats_tolerance)
 
         print("\n########################## Statistics ######################################")
         print(" R and std = %f +/- %f" % (stats.R_mean, stats.R_std))
         print(" R2 and std = %f +/- %f" % (stats.R2_mean, stats.R2_std))
         print(" tau and std = %f +/- %f" % (stats.tau_mean, stats.tau_std))
         print(" MUE and std = %f +/- %f" % (stats.mue_mean, stats.mue_std))
+        print(" bootstrap samples used = %d" % stats.repeats_used)
         print("#############################################################################\n\n")
 
     if args.generate_notebook:
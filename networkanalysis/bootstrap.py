@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# !/usr/bin/env python
+
+# This file is part of freenrgworkflows.
+#
+# Copyright 2016,2017 Julien Michel Lab, University of Edinburgh (UK)
+#
+# freenrgworkflows is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Antonia Mey"
+__email__ = "antonia.mey@ed.ac.uk"
+
+import concurrent.futures
+import numpy as np
+
+# replicates drawn from one random stream, results only depend on the seed and not on how blocks are distributed
+BLOCK_SIZE = 10000
+# smaller blocks for adaptive bootstraps, convergence is checked between blocks
+ADAPTIVE_BLOCK_SIZE = 1000
+
+
+def sample_free_energies(values, errors, repeats, random_state=None):
+    r"""Draws all bootstrap replicates of the computed free energies at once
+    Parameters
+    ----------
+    values : array like of floats
+        computed free energy of every compound
+    errors : array like of floats
+        error of every computed free energy, compounds with a zero error keep their value in every replicate
+    repeats : integer
+        number of replicates
+    random_state : np.random.Generator
+        random number generator the replicates are drawn with
+        Default = None, i.e. the global numpy random state
+
+    Returns
+    -------
+    samples : np.array
+        (repeats x compounds) array of free energies drawn from a gaussian around each value
+    """
+    values = np.asarray(values, dtype=np.float64)
+    errors = np.asarray(errors, dtype=np.float64)
+    if random_state is None:
+        random_state = np.random
+    return random_state.normal(values, errors, size=(repeats, len(values)))
+
+
+def pearson_r(samples, reference):
+    r"""
+    Parameters
+    ----------
+    samples : np.array
+        (replicates x compounds) array of free energies
+    reference : array like of floats
+        free energy of every compound to correlate each replicate with
+
+    Returns
+    -------
+    r : np.array
+        Pearson correlation coefficient of every replicate, NaN for a constant replicate
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    x = samples - samples.mean(axis=1)[:, None]
+    y = reference - reference.mean()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = x @ y / (np.sqrt(np.einsum('ij,ij->i', x, x)) * np.sqrt(y @ y))
+    # rounding can push perfectly correlated data just outside [-1, 1]
+    return np.clip(r, -1.0, 1.0)
+
+
+def mean_unsigned_error(samples, reference):
+    r"""
+    Parameters
+    ----------
+    samples : np.array
+        (replicates x compounds) array of free energies
+    reference : array like of floats
+        free energy of every compound
+
+    Returns
+    -------
+    mue : np.array
+        mean absolute deviation of every replicate from the reference
+    """
+    return np.mean(np.abs(np.asarray(samples, dtype=np.float64) - np.asarray(reference, dtype=np.float64)), axis=1)
+
+
+def _pair_ties(sorted_values):
+    r"""number of tied pairs in every row of a row-wise sorted array"""
+    n = sorted_values.shape[1]
+    position = np.arange(n)
+    new = np.ones(sorted_values.shape, dtype=bool)
+    new[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    # position of the first element of the run of equal values every element is in
+    first = np.maximum.accumulate(np.where(new, position, 0), axis=1)
+    return np.sum(position - first, axis=1)
+
+
+def _kendall_tau_pairs(samples, reference, max_bytes):
+    r"""tau-b from the signs of all pairwise differences, evaluated for blocks of replicates"""
+    i, j = np.triu_indices(len(reference), k=1)
+    dy = np.sign(reference[j] - reference[i])
+    n_pairs = len(i)
+    y_ties = np.sum(dy == 0)
+    block = max(1, int(max_bytes // max(8 * n_pairs, 1)))
+    tau = np.empty(len(samples))
+    for start in range(0, len(samples), block):
+        dx = np.sign(samples[start:start + block, j] - samples[start:start + block, i])
+        x_ties = np.sum(dx == 0, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tau[start:start + block] = dx @ dy / np.sqrt((n_pairs - x_ties) * float(n_pairs - y_ties))
+    return tau
+
+
+def _count_inversions(ranks):
+    r"""Number of pairs i < j with ranks[i] > ranks[j] in every row, by a bottom up merge sort that processes all
+    rows and all blocks of one merge level with a few array operations
+
+    Parameters
+    ----------
+    ranks : np.array
+        (rows x n) array of integers between 0 and n-1
+    """
+    rows, n = ranks.shape
+    width = 1
+    while width < n:
+        width *= 2
+    # padding with the largest value at the end adds no inversions
+    current = np.full((rows, width), n, dtype=np.int64)
+    current[:, :n] = ranks
+    inversions = np.zeros(rows, dtype=np.int64)
+    w = 1
+    while w < width:
+        blocks = current.reshape(rows * width // (2 * w), 2, w)
+        # key every value with its block, so that one search over all sorted left halves counts within blocks
+        offset = np.arange(len(blocks), dtype=np.int64)[:, None] * (n + 1)
+        left = (blocks[:, 0, :] + offset).ravel()
+        right = blocks[:, 1, :] + offset
+        not_greater = np.searchsorted(left, right, side='right') - np.arange(len(blocks))[:, None] * w
+        inversions += np.sum((w - not_greater).reshape(rows, -1), axis=1)
+        current = np.sort(blocks.reshape(rows, -1, 2 * w), axis=-1).reshape(rows, width)
+        w *= 2
+    return inversions
+
+
+def _kendall_tau_mergesort(samples, reference, max_bytes):
+    r"""tau-b with Knight's O(n log n) algorithm, evaluated for blocks of replicates"""
+    n = len(reference)
+    n_pairs = n * (n - 1) // 2
+    y_ties = _pair_ties(np.sort(reference)[None, :])[0]
+    block = max(1, int(max_bytes // (64 * n)))
+    tau = np.empty(len(samples))
+    for start in range(0, len(samples), block):
+        x = samples[start:start + block]
+        # order every replicate by the reference and within tied reference values by the replicate
+        order = np.lexsort((x, np.broadcast_to(reference, x.shape)), axis=-1)
+        x = np.take_along_axis(x, order, axis=1)
+        y = reference[order]
+        # pairs tied in both, these are consecutive after the lexsort
+        new = np.ones(x.shape, dtype=bool)
+        new[:, 1:] = (x[:, 1:] != x[:, :-1]) | (y[:, 1:] != y[:, :-1])
+        position = np.arange(n)
+        both_ties = np.sum(position - np.maximum.accumulate(np.where(new, position, 0), axis=1), axis=1)
+        # dense ranks of the replicate values, equal values get the same rank and are never counted as inversions
+        x_order = np.argsort(x, axis=1, kind='stable')
+        x_sorted = np.take_along_axis(x, x_order, axis=1)
+        x_ties = _pair_ties(x_sorted)
+        step = np.zeros(x.shape, dtype=np.int64)
+        step[:, 1:] = x_sorted[:, 1:] != x_sorted[:, :-1]
+        ranks = np.empty(x.shape, dtype=np.int64)
+        np.put_along_axis(ranks, x_order, np.cumsum(step, axis=1), axis=1)
+        discordant = _count_inversions(ranks)
+        score = n_pairs - x_ties - y_ties + both_ties - 2 * discordant
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tau[start:start + block] = score / np.sqrt((n_pairs - x_ties) * float(n_pairs - y_ties))
+    return tau
+
+
+def kendall_tau(samples, reference, method='auto', max_bytes=2 ** 26):
+    r"""Kendall tau-b of every replicate, ties are treated exactly like in scipy.stats.kendalltau
+    Parameters
+    ----------
+    samples : np.array
+        (replicates x compounds) array of free energies
+    reference : array like of floats
+        free energy of every compound
+    method : string
+        'pairs' compares the signs of all pairwise differences, which is fastest for small numbers of compounds,
+        'mergesort' counts discordant pairs by merge sort in O(n log n) per replicate, 'auto' picks 'pairs' for up
+        to 32 compounds
+        Default = 'auto'
+    max_bytes : integer
+        approximate memory used for the replicates processed at once
+        Default = 2 ** 26
+
+    Returns
+    -------
+    tau : np.array
+        tau-b of every replicate, NaN for a constant replicate
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    if method == 'auto':
+        method = 'pairs' if len(reference) <= 32 else 'mergesort'
+    if method == 'pairs':
+        return _kendall_tau_pairs(samples, reference, max_bytes)
+    elif method == 'mergesort':
+        return _kendall_tau_mergesort(samples, reference, max_bytes)
+    raise ValueError("Unknown method %s, use either 'pairs' or 'mergesort'" % method)
+
+
+def _bootstrap_block(values, errors, reference, repeats, seed_sequence):
+    r"""R, Kendall tau and MUE of one block of replicates drawn from its own random stream"""
+    samples = sample_free_energies(values, errors, repeats, random_state=np.random.default_rng(seed_sequence))
+    return pearson_r(samples, reference), kendall_tau(samples, reference), mean_unsigned_error(samples, reference)
+
+
+def _seed_sequence(seed):
+    if seed is None:
+        seed = np.random.randint(0, 2 ** 32, size=4, dtype=np.uint64).tolist()
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed
+
+
+def bootstrap_blocks(values, errors, reference, repeats, seed=None, n_jobs=1, block_size=BLOCK_SIZE):
+    r"""Generates the bootstrap replicates block by block, see bootstrap_statistics. Only a few blocks per worker
+    are evaluated ahead of the caller, so memory use does not grow with the number of replicates, and the caller
+    can stop early by closing the generator. The replicates depend on the seed and the block size.
+
+    Yields
+    ------
+    block : tuple
+        (R, tau, mue) arrays of the replicates of one block, in block order
+    """
+    values = np.asarray(values, dtype=np.float64)
+    errors = np.asarray(errors, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    seed = _seed_sequence(seed)
+    sizes = [min(block_size, repeats - start) for start in range(0, repeats, block_size)]
+    streams = seed.spawn(len(sizes))
+    if n_jobs > 1 and len(sizes) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            pending = []
+            try:
+                for size, stream in zip(sizes, streams):
+                    pending.append(executor.submit(_bootstrap_block, values, errors, reference, size, stream))
+                    if len(pending) >= 2 * n_jobs:
+                        yield pending.pop(0).result()
+                while pending:
+                    yield pending.pop(0).result()
+            finally:
+                # blocks that have not started are not needed when the caller stops early
+                for future in pending:
+                    future.cancel()
+    else:
+        for size, stream in zip(sizes, streams):
+            yield _bootstrap_block(values, errors, reference, size, stream)
+
+
+def bootstrap_statistics(values, errors, reference, repeats, seed=None, n_jobs=1):
+    r"""Bootstrap replicates of the correlation of computed with reference free energies. Replicates are drawn in
+    blocks of BLOCK_SIZE, every block from an independent stream spawned from one seed sequence, so the results
+    are identical for any number of worker processes.
+
+    Parameters
+    ----------
+    values : array like of floats
+        computed free energy of every compound
+    errors : array like of floats
+        error of every computed free energy
+    reference : array like of floats
+        reference, e.g. experimental, free energy of every compound
+    repeats : integer
+        number of replicates
+    seed : integer or np.random.SeedSequence
+        seed of the random streams
+        Default = None, i.e. the seed is drawn from the global numpy random state, so that np.random.seed still
+        makes the results reproducible
+    n_jobs : integer
+        number of worker processes the blocks are distributed over
+        Default = 1
+
+    Returns
+    -------
+    R : np.array
+        Pearson correlation coefficient of every replicate
+    tau : np.array
+        Kendall tau-b of every replicate
+    mue : np.array
+        mean unsigned error of every replicate
+    """
+    blocks = list(bootstrap_blocks(values, errors, reference, repeats, seed=seed, n_jobs=n_jobs))
+    if len(blocks) == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    return tuple(np.concatenate([b[i] for b in blocks]) for i in range(3))
+
+
+class QuantileSketch(object):
+    """Fixed memory quantile estimate of a stream of values, a merging t-digest with the arcsine scale function"""
+
+    def __init__(self, compression=200):
+        r"""
+        Parameters
+        ----------
+        compression : integer
+            the sketch keeps at most about compression / 2 centroids, quantiles in the tails are resolved best
+            Default = 200
+        """
+        self._compression = compression
+        self._means = np.zeros(0)
+        self._weights = np.zeros(0)
+        self._min = np.inf
+        self._max = -np.inf
+
+    def update(self, values):
+        r"""
+        Parameters
+        ----------
+        values : array like of floats
+            new values, NaN values are ignored
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self._min = min(self._min, np.min(values))
+        self._max = max(self._max, np.max(values))
+        means = np.concatenate([self._means, values])
+        weights = np.concatenate([self._weights, np.ones(len(values))])
+        order = np.argsort(means, kind='stable')
+        means = means[order]
+        weights = weights[order]
+        # every centroid spans at most one unit of k = compression / (2 pi) * arcsin(2 q - 1)
+        left = (np.cumsum(weights) - weights) / np.sum(weights)
+        k = self._compression / (2.0 * np.pi) * np.arcsin(2.0 * left - 1.0)
+        cluster = np.floor(k - k[0]).astype(np.int64)
+        merged = np.bincount(cluster, weights=weights)
+        keep = merged > 0
+        self._means = (np.bincount(cluster, weights=weights * means)[keep] / merged[keep])
+        self._weights = merged[keep]
+
+    def quantile(self, q):
+        r"""
+        Parameters
+        ----------
+        q : float or array like of floats
+            quantiles between 0 and 1
+
+        Returns
+        -------
+        values : float or np.array
+            estimated values at the quantiles, NaN if no values have been added
+        """
+        if len(self._weights) == 0:
+            return np.full(np.shape(q), np.nan)[()]
+        total = np.sum(self._weights)
+        centres = np.cumsum(self._weights) - 0.5 * self._weights
+        return np.interp(np.asarray(q) * total, np.concatenate([[0.0], centres, [total]]),
+                         np.concatenate([[self._min], self._means, [self._max]]))
+
+    @property
+    def count(self):
+        return np.sum(self._weights)
+
+
+class StreamingSummary(object):
+    """Running count, mean and variance (Chan's parallel update of Welford's algorithm) and a quantile sketch of a
+    stream of values that arrive in blocks"""
+
+    def __init__(self, compression=200):
+        r"""
+        Parameters
+        ----------
+        compression : integer
+            compression of the QuantileSketch
+            Default = 200
+        """
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._sketch = QuantileSketch(compression)
+
+    def update(self, values):
+        r"""
+        Parameters
+        ----------
+        values : array like of floats
+            next block of values
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        count = self._count + len(values)
+        mean = np.mean(values)
+        delta = mean - self._mean
+        self._m2 += np.sum((values - mean) ** 2) + delta ** 2 * self._count * len(values) / count
+        self._mean += delta * len(values) / count
+        self._count = count
+        self._sketch.update(values)
+
+    def quantile(self, q):
+        return self._sketch.quantile(q)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        return self._mean if self._count > 0 else np.nan
+
+    @property
+    def std(self):
+        r"""population standard deviation, like np.std"""
+        return np.sqrt(self._m2 / self._count) if self._count > 0 else np.nan
+
+    @property
+    def median(self):
+        return self._sketch.quantile(0.5)
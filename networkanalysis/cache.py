@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# !/usr/bin/env python
+
+# This file is part of freenrgworkflows.
+#
+# Copyright 2016,2017 Julien Michel Lab, University of Edinburgh (UK)
+#
+# freenrgworkflows is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Antonia Mey"
+__email__ = "antonia.mey@ed.ac.uk"
+
+import collections
+import hashlib
+import os
+import tempfile
+import numpy as np
+from .graphcore import CompactGraph
+
+# changes whenever the way a file is turned into a symmetrised graph changes, old cache entries are then ignored
+CACHE_VERSION = 1
+# changes whenever the free energies computed for a graph change, e.g. the solver or the weighting of paths, results
+# stored by older versions are then ignored
+RESULT_VERSION = 1
+
+
+def _save_npz(filename, **arrays):
+    r"""writes arrays to a temporary file first, so concurrent readers never see a partially written .npz file"""
+    handle, tmp = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(filename))
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def graph_fingerprint(graph):
+    r"""
+    Parameters
+    ----------
+    graph : CompactGraph
+        perturbation graph
+
+    Returns
+    -------
+    fingerprint : String
+        sha256 hex digest of the node names and the edges with their free energies and errors
+    """
+    digest = hashlib.sha256()
+    digest.update('\0'.join(repr(n) for n in graph.names).encode('utf-8'))
+    for a in (graph.source, graph.sink, graph.weight, graph.error):
+        digest.update(np.ascontiguousarray(a).tobytes())
+    return digest.hexdigest()
+
+
+class GraphCache(object):
+    """Directory of symmetrised perturbation graphs stored as .npz files, keyed by the content of the file they were
+    read from and the options used to read it"""
+
+    def __init__(self, directory):
+        r"""
+        Parameters
+        ----------
+        directory : String
+            directory holding the cache files, it is created if it does not exist
+        """
+        self._directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, filename, **options):
+        r"""
+        Parameters
+        ----------
+        filename : String
+            network file
+        options : keyword arguments
+            options the file is parsed with, e.g. delimiter and comments
+
+        Returns
+        -------
+        key : String
+            sha256 hex digest of the file contents, the options and the cache version
+        """
+        digest = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        digest.update(repr((CACHE_VERSION, sorted(options.items()))).encode('utf-8'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self._directory, '%s.npz' % key)
+
+    def load(self, key):
+        r"""
+        Parameters
+        ----------
+        key : String
+            cache key, see GraphCache.key
+
+        Returns
+        -------
+        graph : CompactGraph or None
+            cached graph, None if there is no (readable) entry for the key
+        """
+        try:
+            with np.load(self.path(key), allow_pickle=False) as data:
+                return CompactGraph(data['names'].tolist(), data['source'], data['sink'], data['weight'],
+                                    data['error'], data['hysteresis'])
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+    def store(self, key, graph):
+        r"""
+        Parameters
+        ----------
+        key : String
+            cache key, see GraphCache.key
+        graph : CompactGraph
+            graph to be stored
+        """
+        _save_npz(self.path(key), names=np.array(graph.names, dtype=str), source=graph.source, sink=graph.sink,
+                  weight=graph.weight, error=graph.error, hysteresis=graph.hysteresis)
+
+    @property
+    def directory(self):
+        return self._directory
+
+
+class ResultCache(object):
+    """Least recently used cache of computed free energies, optionally backed by a directory of .npz files"""
+
+    def __init__(self, maxsize=32, directory=None):
+        r"""
+        Parameters
+        ----------
+        maxsize : integer
+            maximum number of results kept in memory, the least recently used result is dropped first
+            Default = 32
+        directory : String
+            directory in which every result is also stored, results dropped from memory or computed in an earlier
+            run are read from there
+            Default = None, i.e. results are only kept in memory
+        """
+        self._maxsize = maxsize
+        self._directory = directory
+        self._results = collections.OrderedDict()
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self._directory, '%s.npz' % key)
+
+    def key(self, *parts):
+        r"""
+        Parameters
+        ----------
+        parts : arguments
+            everything the result depends on, e.g. the graph fingerprint, target compound and method
+
+        Returns
+        -------
+        key : String
+            sha256 hex digest of the parts and the result version
+        """
+        return hashlib.sha256(repr((RESULT_VERSION,) + parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        r"""
+        Parameters
+        ----------
+        key : String
+            result key
+
+        Returns
+        -------
+        result : tuple or None
+            (names, free energies, errors, covariance or None), None if the result is not cached
+        """
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+        if self._directory is None:
+            return None
+        try:
+            with np.load(self._path(key), allow_pickle=False) as data:
+                covariance = data['covariance'] if 'covariance' in data else None
+                result = (data['names'].tolist(), data['values'], data['errors'], covariance)
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+        self._remember(key, result)
+        return result
+
+    def put(self, key, names, values, errors, covariance=None):
+        r"""
+        Parameters
+        ----------
+        key : String
+            result key
+        names : list of Strings
+            compound names
+        values : array like of floats
+            free energy of every compound
+        errors : array like of floats
+            error of the free energy of every compound
+        covariance : np.array
+            covariance of the free energies
+            Default = None
+        """
+        result = (list(names), np.asarray(values, dtype=np.float64), np.asarray(errors, dtype=np.float64),
+                  covariance)
+        self._remember(key, result)
+        if self._directory is not None:
+            arrays = {'names': np.array(result[0], dtype=str), 'values': result[1], 'errors': result[2]}
+            if covariance is not None:
+                arrays['covariance'] = covariance
+            _save_npz(self._path(key), **arrays)
+
+    def _remember(self, key, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self._maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        r"""drops all results held in memory, results on disk are kept"""
+        self._results.clear()
+
+    def __len__(self):
+        return len(self._results)
+
+    def __contains__(self, key):
+        return key in self._results
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# !/usr/bin/env python
+
+# This file is part of freenrgworkflows.
+#
+# Copyright 2016,2017 Julien Michel Lab, University of Edinburgh (UK)
+#
+# freenrgworkflows is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Antonia Mey"
+__email__ = "antonia.mey@ed.ac.uk"
+
+import collections
+import numpy as np
+import scipy.sparse
+
+cycle_dtype = np.dtype([('cycle', object), ('length', np.int64), ('closure', np.float64), ('error', np.float64)])
+
+
+def _neighbours(graph):
+    r"""sorted undirected neighbour lists of every node of a CompactGraph"""
+    neighbours = [set() for i in range(graph.n_nodes)]
+    for u, v in zip(graph.source.tolist(), graph.sink.tolist()):
+        if u != v:
+            neighbours[u].add(v)
+            neighbours[v].add(u)
+    return [sorted(n) for n in neighbours]
+
+
+def undirected_cycles(graph, max_length=None):
+    r"""Enumerates every undirected simple cycle of a graph exactly once
+
+    Each cycle is grown from its smallest node through larger nodes only and is kept in the direction in which its
+    second node is smaller than its last node. Paths are not extended beyond max_length nodes.
+
+    Parameters
+    ----------
+    graph : CompactGraph
+        perturbation graph
+    max_length : integer
+        maximum number of nodes (and edges) of a cycle
+        Default = None, i.e. no limit
+
+    Returns
+    -------
+    cycles : list of tuples
+        node ids along every cycle with at least three nodes
+    """
+    neighbours = _neighbours(graph)
+    if max_length is None:
+        max_length = graph.n_nodes
+    cycles = []
+    on_path = [False] * graph.n_nodes
+    for start in range(graph.n_nodes):
+        path = [start]
+        on_path[start] = True
+        stack = [iter(neighbours[start])]
+        while stack:
+            for v in stack[-1]:
+                if v == start:
+                    if len(path) >= 3 and path[1] < path[-1]:
+                        cycles.append(tuple(path))
+                    continue
+                if v < start or on_path[v] or len(path) >= max_length:
+                    continue
+                on_path[v] = True
+                path.append(v)
+                stack.append(iter(neighbours[v]))
+                break
+            else:
+                stack.pop()
+                on_path[path.pop()] = False
+    return cycles
+
+
+def cycle_basis(graph):
+    r"""Fundamental cycle basis from a breadth first spanning forest, one cycle per edge not in the forest
+
+    Parameters
+    ----------
+    graph : CompactGraph
+        perturbation graph
+
+    Returns
+    -------
+    cycles : list of tuples
+        node ids along every basis cycle
+    """
+    neighbours = _neighbours(graph)
+    parent = [-1] * graph.n_nodes
+    depth = [-1] * graph.n_nodes
+    cycles = []
+    for root in range(graph.n_nodes):
+        if depth[root] >= 0:
+            continue
+        depth[root] = 0
+        queue = collections.deque([root])
+        order = []
+        while queue:
+            u = queue.popleft()
+            order.append(u)
+            for v in neighbours[u]:
+                if depth[v] < 0:
+                    depth[v] = depth[u] + 1
+                    parent[v] = u
+                    queue.append(v)
+        for u in order:
+            for v in neighbours[u]:
+                if u < v and parent[v] != u and parent[u] != v:
+                    # walk both ends up to their lowest common ancestor
+                    left = [u]
+                    right = [v]
+                    while left[-1] != right[-1]:
+                        if depth[left[-1]] >= depth[right[-1]]:
+                            left.append(parent[left[-1]])
+                        else:
+                            right.append(parent[right[-1]])
+                    cycles.append(tuple(left + right[-2::-1]))
+    return cycles
+
+
+class CycleIncidence(object):
+    """Sparse cycle/edge incidence matrix, the closures of all cycles are a single sparse matrix-vector product"""
+
+    def __init__(self, graph, cycles):
+        r"""
+        Parameters
+        ----------
+        graph : CompactGraph
+            perturbation graph the cycles were found in
+        cycles : list of tuples
+            node ids along every cycle
+
+        Columns are undirected edges identified by their node names, so the matrix stays valid for any graph with
+        the same compounds, e.g. after more replicate data has been merged into the network.
+        """
+        names = graph.names
+        self._cycles = [tuple(names[n] for n in c) for c in cycles]
+        lengths = np.array([len(c) for c in cycles], dtype=np.int64)
+        source = np.array([n for c in cycles for n in c], dtype=np.int64)
+        sink = np.array([n for c in cycles for n in c[1:] + c[:1]], dtype=np.int64)
+        lower = np.minimum(source, sink)
+        upper = np.maximum(source, sink)
+        keys, columns = np.unique(lower * graph.n_nodes + upper, return_inverse=True)
+        self._lower = [names[n] for n in keys // max(graph.n_nodes, 1)]
+        self._upper = [names[n] for n in keys % max(graph.n_nodes, 1)]
+        # +1 where the cycle runs along the edge from its lower to its upper node, -1 otherwise
+        signs = np.where(source < sink, 1.0, -1.0)
+        rows = np.repeat(np.arange(len(cycles)), lengths)
+        self._matrix = scipy.sparse.csr_matrix((signs, (rows, columns.ravel())), shape=(len(cycles), len(keys)))
+        self._abs_matrix = abs(self._matrix)
+
+    def edge_values(self, graph):
+        r"""
+        Parameters
+        ----------
+        graph : CompactGraph
+            perturbation graph with the current edge free energies
+
+        Returns
+        -------
+        weight : np.array
+            free energy of every column edge from its lower to its upper node, NaN if the edge is missing
+        error : np.array
+            error of every column edge, NaN if the edge is missing
+        """
+        index = graph.index
+        lower = np.array([index.get(n, -1) for n in self._lower], dtype=np.int64)
+        upper = np.array([index.get(n, -1) for n in self._upper], dtype=np.int64)
+        known = (lower >= 0) & (upper >= 0)
+        edges = np.full(len(lower), -1, dtype=np.int64)
+        edges[known] = graph.edge_ids(lower[known], upper[known])
+        found = edges >= 0
+        weight = np.full(len(lower), np.nan)
+        error = np.full(len(lower), np.nan)
+        weight[found] = graph.weight[edges[found]]
+        error[found] = graph.error[edges[found]]
+        return weight, error
+
+    def evaluate(self, graph):
+        r"""
+        Parameters
+        ----------
+        graph : CompactGraph
+            perturbation graph with the current edge free energies
+
+        Returns
+        -------
+        closures : np.array
+            structured array with the fields cycle (tuple of node names), length, closure and error. Cycles through
+            edges that are no longer in the graph have a NaN closure.
+        """
+        weight, error = self.edge_values(graph)
+        closures = np.zeros(len(self._cycles), dtype=cycle_dtype)
+        for i, c in enumerate(self._cycles):
+            closures['cycle'][i] = c
+        closures['length'] = np.diff(self._matrix.indptr)
+        closures['closure'] = self._matrix @ weight
+        closures['error'] = np.sqrt(self._abs_matrix @ error ** 2)
+        return closures
+
+    @property
+    def matrix(self):
+        r"""sparse (cycles x edges) incidence matrix with entries +1/-1"""
+        return self._matrix
+
+    @property
+    def edges(self):
+        r"""(lower, upper) node names of the edge of every column"""
+        return list(zip(self._lower, self._upper))
+
+    @property
+    def cycles(self):
+        r"""node names along every cycle, one per row"""
+        return self._cycles
+
+
+def cycle_closures(graph, cycles):
+    r"""Closure free energies and their propagated errors of a list of cycles, evaluated for all cycles at once
+
+    Parameters
+    ----------
+    graph : CompactGraph
+        perturbation graph, every cycle edge must be present in the direction of the cycle
+    cycles : list of tuples
+        node ids along every cycle
+
+    Returns
+    -------
+    closures : np.array
+        structured array with the fields cycle (tuple of node names), length, closure and error
+    """
+    return CycleIncidence(graph, cycles).evaluate(graph)
@@ -28,6 +28,7 @@ import networkx as nx
 import scipy.stats
 import copy
 import sys
+from .freeenergies import FreeEnergyTable
 
 
 class ExperimentalData(object):
@@ -86,6 +87,8 @@ class ExperimentalData(object):
             a_kJ[key] = self._kTkJ * np.log(r)
             a_kJ['error'] = self._kTkJ * np.log(2)
             self._DG_in_kJ.append(a_kJ)
+        self._DG_in_kcal = FreeEnergyTable.from_dicts(self._DG_in_kcal)
+        self._DG_in_kJ = FreeEnergyTable.from_dicts(self._DG_in_kJ)
 
     def compute_DDG_from_kD(self, filename, reference=None, delimiter=','):
         r"""Reads KDs from file and converts them to DDG values to a given reference compound
@@ -131,6 +134,8 @@ class ExperimentalData(object):
             a_kJ[key] = self._RTkJ * np.log(r)
             a_kJ['error'] = self._RTkJ * np.log(2)
             self._DG_in_kJ.append(a_kJ)
+        self._DG_in_kcal = FreeEnergyTable.from_dicts(self._DG_in_kcal)
+        self._DG_in_kJ = FreeEnergyTable.from_dicts(self._DG_in_kJ)
 
     def read_free_energies(self, filename, kcal=True, comment='#'):
         r"""Read free energies from a file
@@ -160,6 +165,11 @@ class ExperimentalData(object):
                 self._keys.append(fields[0])
                 self._DG_in_kcal.append(F_kcal)  # append to list of ic50 compounds.
             f.close()
+            self._DG_in_kcal = FreeEnergyTable.from_dicts(self._DG_in_kcal)
+            # the same free energies in kJ/mol
+            kJ_per_kcal = self._RTkJ / self._RTkcal
+            self._DG_in_kJ = FreeEnergyTable(self._DG_in_kcal.names, kJ_per_kcal * self._DG_in_kcal.values,
+                                             kJ_per_kcal * self._DG_in_kcal.errors)
 
     @property
     def ic50s(self):
@@ -171,10 +181,23 @@ class ExperimentalData(object):
 
     @property
     def freeEnergiesInKcal(self):
+        r"""
+        Returns
+        -------
+        freeEnergies : FreeEnergyTable
+            free energies relative to the reference compound in kcal/mol, iterating over it gives dictionaries like
+            {'FXR45': 0.0, 'error': 0.0}
+        """
         return self._DG_in_kcal
 
     @property
     def freeEnergiesInKJmol(self):
+        r"""
+        Returns
+        -------
+        freeEnergies : FreeEnergyTable
+            free energies relative to the reference compound in kJ/mol
+        """
         return self._DG_in_kJ
 
     @property
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# !/usr/bin/env python
+
+# This file is part of freenrgworkflows.
+#
+# Copyright 2016,2017 Julien Michel Lab, University of Edinburgh (UK)
+#
+# freenrgworkflows is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Antonia Mey"
+__email__ = "antonia.mey@ed.ac.uk"
+
+import numpy as np
+
+
+class _FreeEnergyRow(dict):
+    """dictionary of one compound of a FreeEnergyTable. It is built from the arrays of the table, so changing it
+    would not change the table and raises a TypeError instead."""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Dictionaries of a FreeEnergyTable are read only, change its values and errors arrays instead, '
+                        'e.g. with PerturbationGraph.shift_free_energies, or use to_dicts() for a modifiable copy')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        # copies and pickles are plain dictionaries
+        return dict, (dict(self),)
+
+
+class FreeEnergyTable(object):
+    """Columnar free energies of a set of compounds, with the names, values and errors in arrays. Indexing and
+    iteration give read only dictionaries like {'FXR45': 0.0, 'error': 0.0} used throughout the package, changes to
+    the free energies go through the values and errors arrays."""
+
+    def __init__(self, names, values, errors, covariance=None):
+        r"""
+        Parameters
+        ----------
+        names : list of Strings
+            compound names
+        values : array like of floats
+            free energy of every compound
+        errors : array like of floats
+            error of every free energy
+        covariance : np.array
+            covariance of the free energies, rows and columns in the order of names
+            Default = None
+        """
+        self._names = list(names)
+        self._values = np.asarray(values, dtype=np.float64)
+        self._errors = np.asarray(errors, dtype=np.float64)
+        if len(self._values) != len(self._names) or len(self._errors) != len(self._names):
+            raise ValueError('names, values and errors must have the same length')
+        self._covariance = covariance
+        self._index = None
+
+    @classmethod
+    def from_dicts(cls, free_energies):
+        r"""
+        Parameters
+        ----------
+        free_energies : list of dictionaries
+            dictionaries like {'FXR45': 0.0, 'error': 0.0}
+
+        Returns
+        -------
+        table : FreeEnergyTable
+        """
+        if isinstance(free_energies, FreeEnergyTable):
+            return free_energies
+        names = []
+        values = []
+        errors = []
+        for d in free_energies:
+            for k in d:
+                if k != 'error':
+                    names.append(k)
+                    values.append(d[k])
+                    errors.append(d.get('error', 0.0))
+        return cls(names, values, errors)
+
+    def to_dicts(self):
+        r"""
+        Returns
+        -------
+        free_energies : list of dictionaries
+            one dictionary like {'FXR45': 0.0, 'error': 0.0} per compound, changing them does not change the table
+        """
+        return [self._dict(n, v, e) for n, v, e in zip(self._names, self._values.tolist(), self._errors.tolist())]
+
+    def _dict(self, name, value, error):
+        d = {name: value}
+        d['error'] = error
+        return d
+
+    def value(self, name):
+        return self._values[self.index[name]]
+
+    def error(self, name):
+        return self._errors[self.index[name]]
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        return (_FreeEnergyRow(d) for d in self.to_dicts())
+
+    def __getitem__(self, item):
+        r"""a compound position or name gives its dictionary, a slice gives a new table"""
+        if isinstance(item, slice):
+            covariance = self._covariance[item, item] if self._covariance is not None else None
+            return FreeEnergyTable(self._names[item], self._values[item], self._errors[item], covariance)
+        if not isinstance(item, (int, np.integer)):
+            item = self.index[item]
+        return _FreeEnergyRow(self._dict(self._names[item], self._values[item].item(), self._errors[item].item()))
+
+    def __contains__(self, item):
+        if isinstance(item, dict):
+            return item in self.to_dicts()
+        return item in self.index
+
+    def __eq__(self, other):
+        if isinstance(other, (FreeEnergyTable, list)):
+            return self.to_dicts() == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __repr__(self):
+        return 'FreeEnergyTable(%s)' % self.to_dicts()
+
+    @property
+    def names(self):
+        return self._names
+
+    @property
+    def values(self):
+        return self._values
+
+    @property
+    def errors(self):
+        return self._errors
+
+    @property
+    def covariance(self):
+        return self._covariance
+
+    @property
+    def index(self):
+        r"""dictionary mapping compound names to their position, the first position of a repeated compound"""
+        if self._index is None:
+            self._index = {}
+            for i, n in enumerate(self._names):
+                self._index.setdefault(n, i)
+        return self._index
+
+
+def free_energy_index(free_energies):
+    r"""Builds a lookup of a free energy series in a single pass
+    Parameters
+    ----------
+    free_energies : FreeEnergyTable or list of dictionaries
+        free energies, e.g. dictionaries like {'FXR45': 0.0, 'error': 0.0}
+
+    Returns
+    -------
+    index : dictionary
+        (free energy, error) of every compound, if a compound appears more than once the first entry is used
+    """
+    table = FreeEnergyTable.from_dicts(free_energies)
+    values = table.values.tolist()
+    errors = table.errors.tolist()
+    return dict((n, (values[i], errors[i])) for n, i in table.index.items())
+
+
+def common_compounds(series1, series2):
+    r"""
+    Parameters
+    ----------
+    series1 : FreeEnergyTable or list of dictionaries
+        first free energy series
+    series2 : FreeEnergyTable or list of dictionaries
+        second free energy series
+
+    Returns
+    -------
+    names : list of Strings
+        sorted names of the compounds in both series
+    """
+    index2 = FreeEnergyTable.from_dicts(series2).index
+    return sorted(n for n in FreeEnergyTable.from_dicts(series1).index if n in index2)
+
+
+def align_free_energies(series1, series2, compound_list=None):
+    r"""Aligns two free energy series, e.g. computed and experimental, compound by compound. Both series are indexed
+    once, so aligning takes time linear in the number of compounds.
+
+    Parameters
+    ----------
+    series1 : FreeEnergyTable or list of dictionaries
+        first free energy series
+    series2 : FreeEnergyTable or list of dictionaries
+        second free energy series
+    compound_list : list of Strings
+        compounds to be aligned, in the order they should appear in
+        Default = None, i.e. all compounds in both series in sorted order
+
+    Returns
+    -------
+    names : list of Strings
+        aligned compounds
+    values1 : np.array
+        free energy of every compound in the first series
+    errors1 : np.array
+        error of every free energy in the first series
+    values2 : np.array
+        free energy of every compound in the second series
+    errors2 : np.array
+        error of every free energy in the second series
+    """
+    table1 = FreeEnergyTable.from_dicts(series1)
+    table2 = FreeEnergyTable.from_dicts(series2)
+    index1 = table1.index
+    index2 = table2.index
+    if compound_list is None:
+        names = sorted(set(index1).intersection(index2))
+    else:
+        names = list(compound_list)
+        missing = [n for n in names if n not in index1 or n not in index2]
+        if missing:
+            raise KeyError('Compounds %s are not in both free energy series' % missing)
+    first = np.array([index1[n] for n in names], dtype=np.int64)
+    second = np.array([index2[n] for n in names], dtype=np.int64)
+    return names, table1.values[first], table1.errors[first], table2.values[second], table2.errors[second]
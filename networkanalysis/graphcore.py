@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# !/usr/bin/env python
+
+# This file is part of freenrgworkflows.
+#
+# Copyright 2016,2017 Julien Michel Lab, University of Edinburgh (UK)
+#
+# freenrgworkflows is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Antonia Mey"
+__email__ = "antonia.mey@ed.ac.uk"
+
+import numpy as np
+import networkx as nx
+import scipy.sparse
+import scipy.sparse.csgraph
+
+
+class CompactGraph(object):
+    """Integer indexed directed graph with the edges stored in contiguous numpy arrays in CSR order"""
+
+    def __init__(self, names, source, sink, weight, error, hysteresis=None):
+        r"""
+        Parameters
+        ----------
+        names : list of strings
+            node names, the position in the list is the integer id of the node
+        source : array like of integers
+            id of the start node of every edge
+        sink : array like of integers
+            id of the end node of every edge
+        weight : array like of floats
+            free energy of every edge
+        error : array like of floats
+            error of the free energy of every edge
+        hysteresis : array like of floats
+            sum of the forward and backward free energy every symmetrised edge was computed from, NaN where
+            there was no backward simulation
+            Default = None, i.e. unknown
+
+        If an edge is given more than once, the last occurrence is kept.
+        """
+        self._names = list(names)
+        self._index = {n: i for i, n in enumerate(self._names)}
+        source = np.asarray(source, dtype=np.int64)
+        sink = np.asarray(sink, dtype=np.int64)
+        weight = np.asarray(weight, dtype=np.float64)
+        error = np.asarray(error, dtype=np.float64)
+        if hysteresis is None:
+            hysteresis = np.full(len(source), np.nan)
+        hysteresis = np.asarray(hysteresis, dtype=np.float64)
+        n_nodes = len(self._names)
+        # sort by (source, sink) and keep the last of duplicated edges
+        keys = source * n_nodes + sink
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        last = np.ones(len(keys), dtype=bool)
+        last[:-1] = keys[1:] != keys[:-1]
+        order = order[last]
+        self._keys = keys[last]
+        self._source = source[order]
+        self._sink = sink[order]
+        self._weight = weight[order]
+        self._error = error[order]
+        self._hysteresis = hysteresis[order]
+        self._indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._source, minlength=n_nodes), out=self._indptr[1:])
+
+    @classmethod
+    def from_edges(cls, source_names, sink_names, weight, error, names=None):
+        r"""builds a graph from edges given by node names, interning the names to integer ids
+        Parameters
+        ----------
+        source_names : array like of strings
+            name of the start node of every edge
+        sink_names : array like of strings
+            name of the end node of every edge
+        weight : array like of floats
+            free energy of every edge
+        error : array like of floats
+            error of the free energy of every edge
+        names : list of strings
+            nodes that should come first in the id order, e.g. the nodes of an existing graph
+            Default = None
+
+        Returns
+        -------
+        graph : CompactGraph
+        """
+        source_names = np.asarray(source_names, dtype=str)
+        sink_names = np.asarray(sink_names, dtype=str)
+        n_edges = len(source_names)
+        all_names = np.concatenate([np.array(list(names) if names is not None else [], dtype=str),
+                                    np.column_stack([source_names, sink_names]).ravel()])
+        unique, first, inverse = np.unique(all_names, return_index=True, return_inverse=True)
+        # number nodes in the order in which they first appear
+        order = np.argsort(first, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        ids = rank[inverse.ravel()][len(all_names) - 2 * n_edges:].reshape(n_edges, 2)
+        return cls(unique[order].tolist(), ids[:, 0], ids[:, 1], weight, error)
+
+    @classmethod
+    def from_networkx(cls, graph):
+        r"""
+        Parameters
+        ----------
+        graph : networkx graph
+            directed networkx graph with 'weight' and 'error' edge attributes
+
+        Returns
+        -------
+        graph : CompactGraph
+        """
+        names = list(graph.nodes())
+        index = {n: i for i, n in enumerate(names)}
+        n_edges = graph.number_of_edges()
+        source = np.empty(n_edges, dtype=np.int64)
+        sink = np.empty(n_edges, dtype=np.int64)
+        weight = np.empty(n_edges)
+        error = np.empty(n_edges)
+        for i, (u, v, w) in enumerate(graph.edges(data=True)):
+            source[i] = index[u]
+            sink[i] = index[v]
+            weight[i] = w['weight']
+            error[i] = w['error']
+        return cls(names, source, sink, weight, error)
+
+    def to_networkx(self):
+        r"""
+        Returns
+        -------
+        graph : networkx.DiGraph
+            directed networkx graph with 'weight' and 'error' edge attributes
+        """
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self._names)
+        names = self._names
+        graph.add_edges_from((names[u], names[v], {'weight': w, 'error': e}) for u, v, w, e in
+                             zip(self._source.tolist(), self._sink.tolist(), self._weight.tolist(),
+                                 self._error.tolist()))
+        return graph
+
+    def edge_ids(self, source, sink):
+        r"""
+        Parameters
+        ----------
+        source : array like of integers
+            start node ids
+        sink : array like of integers
+            end node ids
+
+        Returns
+        -------
+        ids : np.array
+            position of each edge in the edge arrays, -1 where there is no such edge
+        """
+        keys = np.asarray(source, dtype=np.int64) * self.n_nodes + np.asarray(sink, dtype=np.int64)
+        if len(self._keys) == 0:
+            return np.full(keys.shape, -1, dtype=np.int64)
+        ids = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return np.where(self._keys[ids] == keys, ids, -1)
+
+    def has_edge(self, u, v):
+        r"""
+        Parameters
+        ----------
+        u : string
+            name of the start node
+        v : string
+            name of the end node
+        """
+        if u not in self._index or v not in self._index:
+            return False
+        return self.edge_ids([self._index[u]], [self._index[v]])[0] >= 0
+
+    def undirected_edges(self):
+        r"""
+        Returns
+        -------
+        mask : np.array of booleans
+            selects every edge of a symmetric pair once, edges without a reverse edge are always selected
+        """
+        reverse = self.edge_ids(self._sink, self._source)
+        return (self._source < self._sink) | (reverse < 0)
+
+    def adjacency_lists(self):
+        r"""
+        Returns
+        -------
+        adjacency : list of lists
+            for every node a list of (neighbour, weight, squared error) tuples of its outgoing edges
+        """
+        sink = self._sink.tolist()
+        weight = self._weight.tolist()
+        error2 = (self._error ** 2).tolist()
+        indptr = self._indptr.tolist()
+        return [list(zip(sink[indptr[u]:indptr[u + 1]], weight[indptr[u]:indptr[u + 1]],
+                         error2[indptr[u]:indptr[u + 1]])) for u in range(self.n_nodes)]
+
+    def remove_nodes(self, nodes):
+        r"""
+        Parameters
+        ----------
+        nodes : list of strings
+            names of the nodes to be removed together with all their edges
+
+        Returns
+        -------
+        graph : CompactGraph
+            new graph without the nodes, the remaining nodes keep their relative order
+        """
+        drop = np.zeros(self.n_nodes, dtype=bool)
+        drop[[self._index[n] for n in nodes]] = True
+        new_ids = np.cumsum(~drop) - 1
+        keep = ~(drop[self._source] | drop[self._sink])
+        names = [n for n, d in zip(self._names, drop) if not d]
+        return CompactGraph(names, new_ids[self._source[keep]], new_ids[self._sink[keep]], self._weight[keep],
+                            self._error[keep], self._hysteresis[keep])
+
+    @property
+    def n_nodes(self):
+        return len(self._names)
+
+    @property
+    def n_edges(self):
+        return len(self._source)
+
+    @property
+    def names(self):
+        r"""node names, ordered by node id"""
+        return self._names
+
+    @property
+    def index(self):
+        r"""dictionary mapping node names to node ids"""
+        return self._index
+
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def sink(self):
+        return self._sink
+
+    @property
+    def weight(self):
+        return self._weight
+
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def hysteresis(self):
+        return self._hysteresis
+
+    @property
+    def indptr(self):
+        r"""CSR row pointer, the outgoing edges of node u are edges indptr[u] to indptr[u+1]-1"""
+        return self._indptr
+
+
+def symmetrize(graph):
+    r"""Symmetrises a graph in one pass over its edge arrays. Forward and backward edges are paired through the
+    sorted edge keys, paired edges are replaced by their hysteresis averaged free energy and edges without a
+    backward edge get a reverse edge with the negative free energy.
+
+    Parameters
+    ----------
+    graph : CompactGraph
+        directed graph of forward and (where available) backward perturbations
+
+    Returns
+    -------
+    graph : CompactGraph
+        symmetrised graph, the hysteresis of every edge is available as graph.hysteresis
+    """
+    weight = graph.weight
+    error = graph.error
+    reverse = graph.edge_ids(graph.sink, graph.source)
+    paired = reverse >= 0
+    backward = reverse[paired]
+    hysteresis = np.full(graph.n_edges, np.nan)
+    hysteresis[paired] = weight[paired] + weight[backward]
+    sym_weight = weight.copy()
+    sym_weight[paired] = 0.5 * (weight[paired] - weight[backward])
+    # the standard deviation of the forward and the negative backward free energy, divided by sqrt(2)
+    sym_error = error.copy()
+    spread = np.abs(hysteresis[paired]) / (2.0 * np.sqrt(2.0))
+    # identical forward and backward free energies carry no information on the error, use the simulation errors
+    identical = spread == 0.0
+    spread[identical] = 0.5 * (error[paired][identical] + error[backward][identical])
+    sym_error[paired] = spread
+    single = ~paired
+    return CompactGraph(graph.names,
+                        np.concatenate([graph.source, graph.sink[single]]),
+                        np.concatenate([graph.sink, graph.source[single]]),
+                        np.concatenate([sym_weight, -weight[single]]),
+                        np.concatenate([sym_error, error[single]]),
+                        np.concatenate([hysteresis, hysteresis[single]]))
+
+
+def connected_components(graph):
+    r"""
+    Parameters
+    ----------
+    graph : CompactGraph
+        perturbation graph
+
+    Returns
+    -------
+    n_components : integer
+        number of weakly connected components
+    labels : np.array
+        component of every node, components are numbered in order of their first node
+    """
+    adjacency = scipy.sparse.coo_matrix((np.ones(graph.n_edges), (graph.source, graph.sink)),
+                                        shape=(graph.n_nodes, graph.n_nodes))
+    return scipy.sparse.csgraph.connected_components(adjacency, directed=True, connection='weak')
+
+
+def split_components(graph, labels=None):
+    r"""Splits a graph into one graph per weakly connected component with a single sort of the edge arrays
+
+    Parameters
+    ----------
+    graph : CompactGraph
+        perturbation graph
+    labels : np.array
+        component of every node, see connected_components
+        Default = None, i.e. computed
+
+    Returns
+    -------
+    graphs : list of CompactGraph
+        graph of every component in the order of the labels, nodes keep their relative order
+    """
+    if labels is None:
+        labels = connected_components(graph)[1]
+    labels = np.asarray(labels, dtype=np.int64)
+    n_components = int(labels.max()) + 1 if len(labels) > 0 else 0
+    node_order = np.argsort(labels, kind='stable')
+    node_ptr = np.zeros(n_components + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=n_components), out=node_ptr[1:])
+    # id of every node within its component
+    local = np.empty(graph.n_nodes, dtype=np.int64)
+    local[node_order] = np.arange(graph.n_nodes) - node_ptr[labels[node_order]]
+    edge_labels = labels[graph.source]
+    edge_order = np.argsort(edge_labels, kind='stable')
+    edge_ptr = np.zeros(n_components + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edge_labels, minlength=n_components), out=edge_ptr[1:])
+    names = graph.names
+    graphs = []
+    for c in range(n_components):
+        nodes = node_order[node_ptr[c]:node_ptr[c + 1]]
+        edges = edge_order[edge_ptr[c]:edge_ptr[c + 1]]
+        graphs.append(CompactGraph([names[n] for n in nodes.tolist()], local[graph.source[edges]],
+                                   local[graph.sink[edges]], graph.weight[edges], graph.error[edges],
+                                   graph.hysteresis[edges]))
+    return graphs
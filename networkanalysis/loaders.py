@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# !/usr/bin/env python
+
+# This file is part of freenrgworkflows.
+#
+# Copyright 2016,2017 Julien Michel Lab, University of Edinburgh (UK)
+#
+# freenrgworkflows is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Antonia Mey"
+__email__ = "antonia.mey@ed.ac.uk"
+
+import concurrent.futures
+import functools
+import itertools
+import numpy as np
+import warnings
+from .cache import GraphCache
+from .graphcore import CompactGraph, symmetrize
+
+
+def parse_edge_file(filename, delimiter=',', comments='#', chunksize=500000):
+    r"""Reads a perturbation network file with numpy into typed columns, node names are interned to integer ids.
+    The file is read in chunks, so memory use beyond the final columns is bounded by the chunk size.
+
+    Parameters
+    ----------
+    filename : String
+        network file with the structure node1,node2,DG,eDG, further columns are ignored
+    delimiter : String
+        delimiter for network file
+        Default = ','
+    comments : String
+        Symbol used for comments in network file, everything after it on a line is ignored
+        Default = '#'
+    chunksize : integer
+        number of lines parsed at once
+        Default = 500000
+
+    Returns
+    -------
+    names : list of Strings
+        node names in order of first appearance, the position in the list is the node id
+    source : np.array
+        node id of node1 of every line
+    sink : np.array
+        node id of node2 of every line
+    weight : np.array
+        DG of every line
+    error : np.array
+        eDG of every line
+    """
+    names = []
+    index = {}
+    columns = dict((c, []) for c in ('source', 'sink', 'DG', 'eDG'))
+    with open(filename, 'r') as f, warnings.catch_warnings():
+        # numpy warns about lines that only contain comments
+        warnings.simplefilter('ignore', UserWarning)
+        while True:
+            lines = list(itertools.islice(f, chunksize))
+            if not lines:
+                break
+            # every chunk is tokenised once into a record per line, no name is longer than the longest line
+            width = max(map(len, lines))
+            dtype = [('node1', 'U%d' % width), ('node2', 'U%d' % width), ('DG', np.float64), ('eDG', np.float64)]
+            records = np.loadtxt(lines, delimiter=delimiter, comments=comments, dtype=dtype, usecols=(0, 1, 2, 3),
+                                 ndmin=1)
+            n_lines = len(records)
+            # names are sorted faster at their actual width
+            length = max([int(np.char.str_len(records[c]).max()) for c in ('node1', 'node2') if n_lines > 0] + [1])
+            nodes = np.concatenate([records['node1'].astype('U%d' % length), records['node2'].astype('U%d' % length)])
+            # only the distinct names of a chunk go through python
+            unique, inverse = np.unique(nodes, return_inverse=True)
+            inverse = inverse.ravel()
+            # first appearance of every name in the file, where node1 comes before node2 of the same line
+            first = np.full(len(unique), 2 * n_lines, dtype=np.int64)
+            np.minimum.at(first, inverse, np.concatenate([2 * np.arange(n_lines), 2 * np.arange(n_lines) + 1]))
+            for n in unique[np.argsort(first)].tolist():
+                if n not in index:
+                    index[n] = len(names)
+                    names.append(n)
+            chunk_ids = np.array([index[n] for n in unique.tolist()], dtype=np.int64)[inverse]
+            columns['source'].append(chunk_ids[:n_lines])
+            columns['sink'].append(chunk_ids[n_lines:])
+            columns['DG'].append(records['DG'])
+            columns['eDG'].append(records['eDG'])
+    source, sink = [np.concatenate(columns[c]) if columns[c] else np.zeros(0, dtype=np.int64)
+                    for c in ('source', 'sink')]
+    weight, error = [np.concatenate(columns[c]) if columns[c] else np.zeros(0) for c in ('DG', 'eDG')]
+    return names, source, sink, weight, error
+
+
+def read_edge_file(filename, delimiter=',', comments='#', cache_dir=None):
+    r"""Reads a perturbation network file and symmetrises it, if an edge is listed more than once the last line is used
+    Parameters
+    ----------
+    filename : String
+        network file with the structure node1,node2,DG,eDG
+    delimiter : String
+        delimiter for network file
+        Default = ','
+    comments : String
+        Symbol used for comments in network file
+        Default = '#'
+    cache_dir : String
+        directory in which the symmetrised graph is cached, a file read before with the same content and options
+        is loaded from there without parsing it again
+        Default = None, i.e. no caching
+
+    Returns
+    -------
+    graph : CompactGraph
+        symmetrised perturbation graph
+    """
+    if cache_dir is not None:
+        cache = GraphCache(cache_dir)
+        key = cache.key(filename, delimiter=delimiter, comments=comments)
+        graph = cache.load(key)
+        if graph is None:
+            graph = read_edge_file(filename, delimiter=delimiter, comments=comments)
+            cache.store(key, graph)
+        return graph
+    return symmetrize(CompactGraph(*parse_edge_file(filename, delimiter=delimiter, comments=comments)))
+
+
+class EdgeAccumulator(object):
+    """Streaming statistics of the replicate free energies of every edge. Count, mean and sum of squared deviations
+    (Welford/Chan) as well as the sum of squared errors are kept in arrays with one entry per edge, so any number of replicate graphs can be merged in one pass with memory proportional to the number of
+    edges, and the result does not depend on the order of the replicates."""
+
+    def __init__(self):
+        self._names = []
+        self._index = {}
+        # edges sorted by the key source << 32 | sink, which does not change when nodes are added
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._count = np.zeros(0)
+        self._mean = np.zeros(0)
+        self._m2 = np.zeros(0)
+        self._error2 = np.zeros(0)
+        self._hysteresis_count = np.zeros(0)
+        self._hysteresis_sum = np.zeros(0)
+
+    def add(self, names, source, sink, weight, error, hysteresis=None):
+        r"""
+        Parameters
+        ----------
+        names : list of Strings
+            node names, the position in the list is the id of the node in source and sink
+        source : array like of integers
+            id of the start node of every edge
+        sink : array like of integers
+            id of the end node of every edge
+        weight : array like of floats
+            free energy of every edge, an edge may be given more than once
+        error : array like of floats
+            error of the free energy of every edge
+        hysteresis : array like of floats
+            hysteresis of every edge, NaN where it is unknown
+            Default = None, i.e. unknown
+        """
+        for n in names:
+            if n not in self._index:
+                self._index[n] = len(self._names)
+                self._names.append(n)
+        ids = np.array([self._index[n] for n in names], dtype=np.int64)
+        weight = np.asarray(weight, dtype=np.float64)
+        error = np.asarray(error, dtype=np.float64)
+        if hysteresis is None:
+            hysteresis = np.full(len(weight), np.nan)
+        hysteresis = np.asarray(hysteresis, dtype=np.float64)
+        keys = (ids[np.asarray(source, dtype=np.int64)] << 32) | ids[np.asarray(sink, dtype=np.int64)]
+        # statistics of the new replicates of every edge
+        keys, edge = np.unique(keys, return_inverse=True)
+        edge = edge.ravel()
+        n_keys = len(keys)
+        count = np.bincount(edge, minlength=n_keys).astype(np.float64)
+        mean = np.bincount(edge, weights=weight, minlength=n_keys) / count
+        m2 = np.bincount(edge, weights=(weight - mean[edge]) ** 2, minlength=n_keys)
+        error2 = np.bincount(edge, weights=error ** 2, minlength=n_keys)
+        finite = np.isfinite(hysteresis)
+        hysteresis_count = np.bincount(edge, weights=finite, minlength=n_keys)
+        hysteresis_sum = np.bincount(edge, weights=np.where(finite, hysteresis, 0.0), minlength=n_keys)
+        # merge with the edges seen before
+        position = np.searchsorted(self._keys, keys)
+        known = position < len(self._keys)
+        known[known] = self._keys[position[known]] == keys[known]
+        old = position[known]
+        n_old = self._count[old]
+        n_new = count[known]
+        total = n_old + n_new
+        delta = mean[known] - self._mean[old]
+        self._mean[old] += delta * n_new / total
+        self._m2[old] += m2[known] + delta ** 2 * n_old * n_new / total
+        self._count[old] = total
+        self._error2[old] += error2[known]
+        self._hysteresis_count[old] += hysteresis_count[known]
+        self._hysteresis_sum[old] += hysteresis_sum[known]
+        unknown = ~known
+        where = position[unknown]
+        self._keys = np.insert(self._keys, where, keys[unknown])
+        self._count = np.insert(self._count, where, count[unknown])
+        self._mean = np.insert(self._mean, where, mean[unknown])
+        self._m2 = np.insert(self._m2, where, m2[unknown])
+        self._error2 = np.insert(self._error2, where, error2[unknown])
+        self._hysteresis_count = np.insert(self._hysteresis_count, where, hysteresis_count[unknown])
+        self._hysteresis_sum = np.insert(self._hysteresis_sum, where, hysteresis_sum[unknown])
+
+    def add_graph(self, graph):
+        r"""
+        Parameters
+        ----------
+        graph : CompactGraph
+            replicate graph, every edge of it is one replicate
+        """
+        self.add(graph.names, graph.source, graph.sink, graph.weight, graph.error, graph.hysteresis)
+
+    def remove_nodes(self, nodes):
+        r"""drops nodes together with the statistics of all their edges, the remaining nodes keep their relative order
+        Parameters
+        ----------
+        nodes : list of Strings
+            names of the nodes to be removed
+        """
+        drop = np.zeros(len(self._names), dtype=bool)
+        drop[[self._index[n] for n in nodes]] = True
+        new_ids = np.cumsum(~drop) - 1
+        source = self.source
+        sink = self.sink
+        keep = ~(drop[source] | drop[sink])
+        # renumbering keeps the order of the nodes, so the keys stay sorted
+        self._keys = (new_ids[source[keep]] << 32) | new_ids[sink[keep]]
+        for name in ('_count', '_mean', '_m2', '_error2', '_hysteresis_count', '_hysteresis_sum'):
+            setattr(self, name, getattr(self, name)[keep])
+        self._names = [n for n, d in zip(self._names, drop) if not d]
+        self._index = {n: i for i, n in enumerate(self._names)}
+
+    def graph(self):
+        r"""
+        Returns
+        -------
+        graph : CompactGraph
+            graph with the mean free energy of every edge and the standard error sqrt(sum(error**2)) / n of that mean,
+            nodes are numbered in order of first appearance
+        """
+        with np.errstate(invalid='ignore'):
+            hysteresis = self._hysteresis_sum / self._hysteresis_count
+        return CompactGraph(self._names, self.source, self.sink, self._mean, self.standard_error, hysteresis)
+
+    @property
+    def names(self):
+        return self._names
+
+    @property
+    def source(self):
+        return self._keys >> 32
+
+    @property
+    def sink(self):
+        return self._keys & 0xffffffff
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def std(self):
+        r"""standard deviation of the replicate free energies of every edge"""
+        return np.sqrt(self._m2 / self._count)
+
+    @property
+    def standard_error(self):
+        r"""sqrt(sum(error**2)) / n, the error of the mean free energy of every edge"""
+        return np.sqrt(self._error2) / self._count
+
+
+def merge_replicates(graphs):
+    r"""Merges the edges of several symmetrised graphs in a single pass. Every edge gets the mean free energy
+    of all graphs containing it and the standard error sqrt(sum(error**2)) / n of that mean, which for two graphs is
+    the same as merging them with PerturbationGraph.add_data_to_graph, but independent of the order of the graphs.
+
+    Parameters
+    ----------
+    graphs : list of CompactGraph
+        graphs to be merged
+
+    Returns
+    -------
+    graph : CompactGraph
+        merged graph, nodes are numbered in order of first appearance
+    """
+    if len(graphs) == 0:
+        raise ValueError('At least one graph is needed')
+    replicates = EdgeAccumulator()
+    for g in graphs:
+        replicates.add_graph(g)
+    return replicates.graph()
+
+
+def accumulate_edge_files(filenames, delimiter=',', comments='#', jobs=1, cache_dir=None, replicates=None):
+    r"""Reads many perturbation network files concurrently and streams their symmetrised edges into an
+    EdgeAccumulator as they are read
+    Parameters
+    ----------
+    filenames : list of Strings
+        network files with the structure node1,node2,DG,eDG
+    delimiter : String
+        delimiter for network file
+        Default = ','
+    comments : String
+        Symbol used for comments in network file
+        Default = '#'
+    jobs : integer
+        number of worker processes used to parse the files
+        Default = 1
+    cache_dir : String
+        directory in which the symmetrised graph of every file is cached, see read_edge_file
+        Default = None, i.e. no caching
+    replicates : EdgeAccumulator
+        accumulator the edges are added to
+        Default = None, i.e. a new accumulator
+
+    Returns
+    -------
+    replicates : EdgeAccumulator
+        replicate statistics of every edge
+    """
+    if replicates is None:
+        replicates = EdgeAccumulator()
+    read = functools.partial(read_edge_file, delimiter=delimiter, comments=comments, cache_dir=cache_dir)
+    if jobs > 1 and len(filenames) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            for graph in executor.map(read, filenames):
+                replicates.add_graph(graph)
+    else:
+        for f in filenames:
+            replicates.add_graph(read(f))
+    return replicates
+
+
+def load_edge_files(filenames, delimiter=',', comments='#', jobs=1, cache_dir=None):
+    r"""Reads many perturbation network files concurrently and merges them into one graph
+    Parameters
+    ----------
+    filenames : list of Strings
+        network files with the structure node1,node2,DG,eDG
+    delimiter : String
+        delimiter for network file
+        Default = ','
+    comments : String
+        Symbol used for comments in network file
+        Default = '#'
+    jobs : integer
+        number of worker processes used to parse the files
+        Default = 1
+    cache_dir : String
+        directory in which the symmetrised graph of every file is cached, see read_edge_file
+        Default = None, i.e. no caching
+
+    Returns
+    -------
+    graph : CompactGraph
+        symmetrised graph with the replicate edges of all files merged, see merge_replicates
+    """
+    if len(filenames) == 0:
+        raise ValueError('At least one graph is needed')
+    return accumulate_edge_files(filenames, delimiter=delimiter, comments=comments, jobs=jobs,
+                                 cache_dir=cache_dir).graph()
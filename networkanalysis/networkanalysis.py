@@ -25,21 +25,66 @@ __email__ = "antonia.mey@ed.ac.uk"
 
 import numpy as np
 import networkx as nx
+import scipy.linalg
+import concurrent.futures
 import copy
+import itertools
+import os
 import sys
 import warnings
+from .cache import ResultCache, graph_fingerprint
+from .freeenergies import FreeEnergyTable
+from .cycles import CycleIncidence, cycle_basis, cycle_closures, undirected_cycles
+from .graphcore import CompactGraph, connected_components, split_components, symmetrize
+from .loaders import EdgeAccumulator, accumulate_edge_files, parse_edge_file, read_edge_file
+from .paths import PathAccumulator, lowest_error_paths, stream_simple_paths
+from .solvers import DENSE_COVARIANCE_SIZE, NetworkSolver
+
+influence_dtype = np.dtype([('edge', object), ('influence', np.float64), ('residual', np.float64),
+                            ('leverage', np.float64)])
+compound_influence_dtype = np.dtype([('compound', object), ('influence', np.float64), ('edges', np.int64),
+                                     ('disconnects', bool)])
 
 
 class PerturbationGraph(object):
     """Populates a directed free energy perturbation graph"""
 
-    def __init__(self):
+    def __init__(self, cache_dir=None, max_cached_results=32):
+        r"""
+        Parameters
+        ----------
+        cache_dir : String
+            directory in which the symmetrised graphs of the network files and the computed free energies are
+            cached, so that files read before with the same options are not parsed again and free energies of an
+            unchanged network are not computed again
+            Default = None, i.e. no caching on disk
+        max_cached_results : integer
+            number of computed free energies kept in memory, see compute_weighted_avg_paths
+            Default = 32
+        """
+        self._cacheDir = cache_dir
+        self._resultCache = ResultCache(max_cached_results,
+                                        os.path.join(cache_dir, 'results') if cache_dir is not None else None)
+        self._graphVersion = 0
+        self._fingerprint = None
+        self._compactGraph = None
+        self._edgeReplicates = None
         self._graph = None
-        self._pathAverages = []
-        self._weightedPathAverages = []
+        self._pathAverages = FreeEnergyTable([], [], [])
+        self._weightedPathAverages = FreeEnergyTable([], [], [])
         self._weighted_paths = None
         self._compoundList = []
-        self._free_energies = []
+        self._free_energies = FreeEnergyTable([], [], [])
+        self._nodeCovariance = None
+        self._mleTarget = None
+        self._mleReferences = None
+        self._mleSolver = None
+        self._mleSolverKey = None
+        self._mleIndex = None
+        self._components = None
+        self._componentReferences = []
+        self._cycleIncidence = None
+        self._cycleParameters = {'max_length': 4, 'basis': False}
 
     def populate_pert_graph(self, filename, delimiter=',', comments='#', nodetype=str,
                             data=(('weight', float), ('error', float))):
@@ -62,53 +107,75 @@ class PerturbationGraph(object):
         data : list
             Default, weight and error on Free energies of node
         """
-        if self._graph == None:
-            graph = nx.read_edgelist(filename, delimiter=delimiter, comments=comments, create_using=nx.DiGraph(),
-                                     nodetype=nodetype, data=data)
-            self._graph = self._symmetrize_graph(graph)
-            self._compoundList = np.sort(self._graph.nodes())
+        if self._compactGraph is None:
+            self._set_graph(self._read_symmetrized_graph(filename, delimiter, comments, nodetype, data))
         else:
             warnings.warn(UserWarning(
                 "Warning...........Use the method add_data_to_graph, to add further data to an existing graph"))
             return 1
 
-    def populate_graph(self, filename, delimiter=',', comments='#'):
-        r"""alternative way of populating graph
-
+    def populate_from_files(self, filenames, delimiter=',', comments='#', jobs=1):
+        r"""
+        Reads many csv files, e.g. one per perturbation or replicate, into a single graph. The files are parsed
+        concurrently and edges found in several files are merged in one step to their mean free energy, with the
+        standard error sqrt(sum(eDG**2)) / n of the mean.
+        Parameters
+        ----------
+        filenames : list of Strings
+            filenames of the forward and backward perturbations generated from simulation output
+            Filestructure should be:
+            node1,node2,DG,eDG
+        delimiter : String
+            delimiter for network file
+            Default = ','
+        comments : String
+            Symbol used for comments in network file
+            Default = '#'
+        jobs : integer
+            number of worker processes used to parse the files
+            Default = 1
         """
-        g = nx.DiGraph()
-        # add bit to check you can read file
-        f = open(filename, 'r')
-        data = f.readlines()
-        f.close()
-
-        # now populate the graph
+        if self._compactGraph is None:
+            replicates = accumulate_edge_files(filenames, delimiter=delimiter, comments=comments, jobs=jobs,
+                                               cache_dir=self._cacheDir)
+            self._set_graph(replicates.graph(), replicates=replicates)
+        else:
+            warnings.warn(UserWarning(
+                "Warning...........Use the method add_data_to_graph, to add further data to an existing graph"))
+            return 1
 
-        for d in data:
-            l = d.strip().split(delimiter)
-            if g.has_edge(l[0], l[1]):
-                print('Must do something with edge: %s,%s' % (l[0], l[1]))
-                a = g.get_edge_data(l[0], l[1])
-                a['weight_list'].append(float(l[2]))
-                g.edges[l[0], l[1]]['weight_list'] = a['weight_list']
-            else:
-                g.add_edge(l[0], l[1], weight=float(l[2]), error=float(l[3]), weight_list=[float(l[2])])
-        for e in g.edges:
-            e_data = g.get_edge_data(e[0], e[1])
-            if 'weight_list' in e_data:
-                w_list = e_data['weight_list']
-                if len(w_list) > 1:
-                    print(e[0], e[1])
-                    print((w_list))
-                    g.edges[e[0], e[1]]['weight'] = np.mean(w_list)
-                    g.edges[e[0], e[1]]['error'] = np.std(w_list)
-        self._graph = self._symmetrize_graph(g)
-        self._compoundList = np.sort(self._graph.nodes())
+    def populate_graph(self, filename, delimiter=',', comments='#'):
+        r"""alternative way of populating graph, edges listed on several lines get the mean of their free energies and
+        the standard deviation of them as error
+        Parameters
+        ----------
+        filename : String
+            filename of the forward and backward perturbation generated from simulation output
+            Filestructure should be:
+            node1,node2,DG,eDG
+        delimiter : String
+            delimiter for network file
+            Default = ','
+        comments : String
+            Symbol used for comments in network file
+            Default = '#'
+        """
+        lines = EdgeAccumulator()
+        lines.add(*parse_edge_file(filename, delimiter=delimiter, comments=comments))
+        # edges given on several lines get the mean and standard deviation of their free energies
+        repeated = lines.count > 1
+        if np.any(repeated):
+            warnings.warn(UserWarning("%d edges are given more than once, their mean free energy is used"
+                                      % np.sum(repeated)))
+        self._set_graph(self._symmetrize_graph(CompactGraph(lines.names, lines.source, lines.sink, lines.mean,
+                                                            np.where(repeated, lines.std, lines.standard_error))))
 
     def add_data_to_graph(self, filename, delimiter=',', comments='#', nodetype=str,
-                          data=(('weight', float), ('error', float))):
+                          data=(('weight', float), ('error', float)), incremental=False):
         r"""
-        Adds data to an existing graph from a csv file in the right networkx format
+        Adds data to an existing graph from a csv file in the right networkx format. Edges already in the graph get
+        the mean free energy of all files they were read from and the standard error sqrt(sum(eDG**2)) / n of that
+        mean, independent of the order in which the files are added.
         Parameters
         ----------
         filename : String
@@ -125,22 +192,52 @@ class PerturbationGraph(object):
             All nodes are usually identified by the compound name
         data : list
             Default, weight and error on Free energies of node
+        incremental : boolean
+            if the free energies were last computed with compute_weighted_avg_paths(method='mle'), refresh them right
+            away, with the same references for the other connected components. The kept factorisation of the network
+            is updated with the merged edges as low-rank updates, so this takes time proportional to the number of
+            changed edges. New compounds and networks with several components need a new factorisation.
+            Default = False
         """
-        newGraph = nx.read_edgelist(filename, delimiter=delimiter, comments=comments, create_using=nx.DiGraph(),
-                                    nodetype=nodetype, data=data)
-        newGraph = self._symmetrize_graph(newGraph)
-        if self._graph != None:
-            for u, v, w in newGraph.edges(data=True):
-                if self._graph.has_edge(u, v):
-                    z = self._graph.get_edge_data(u, v)
-                    mean_edge = np.mean([z['weight'], w['weight']])
-                    error = 0.5 * np.sqrt(z['error'] ** 2 + w['error'] ** 2)
-                    self._graph.remove_edge(u, v)
-                    self._graph.add_edge(u, v, weight=mean_edge, error=error)
-                else:
-                    self._graph.add_edge(u, v, w)
-        else:
-            self._graph = newGraph
+        newGraph = self._read_symmetrized_graph(filename, delimiter, comments, nodetype, data)
+        if self._compactGraph is None:
+            self._set_graph(newGraph)
+            return
+        oldGraph = self._compactGraph
+        solved = self._mleSolver is not None and self._mleSolverKey == (self._graphVersion, self._mleTarget)
+        replicates = self._edgeReplicates
+        if replicates is None:
+            replicates = EdgeAccumulator()
+            replicates.add_graph(oldGraph)
+        replicates.add_graph(newGraph)
+        self._set_graph(replicates.graph(), replicates=replicates)
+        if self._compactGraph.n_edges != oldGraph.n_edges:
+            # new perturbations can close new cycles, the incidence is rebuilt when it is needed next
+            self._cycleIncidence = None
+        if not incremental or self._mleTarget is None:
+            return
+        if solved and self._compactGraph.n_nodes == oldGraph.n_nodes:
+            self._update_mle_solver(newGraph)
+        self.compute_weighted_avg_paths(self._mleTarget, method='mle', references=self._kept_references())
+
+    def _kept_references(self):
+        r"""references of the last compute_weighted_avg_paths(method='mle') that are still the only reference of their
+        connected component, the added data can have joined components
+        Returns
+        -------
+        references : list of Strings
+            references of the components not containing the target node, None if there are none
+        """
+        if not self._mleReferences:
+            return None
+        component = dict((n, c) for c, compounds in enumerate(self.components) for n in compounds)
+        used = set([component.get(self._mleTarget)])
+        references = []
+        for r in self._mleReferences:
+            if r in component and component[r] not in used:
+                used.add(component[r])
+                references.append(r)
+        return references or None
 
     def remove_compound_from_graph(self, compound):
         r""" removes a node from the current graph
@@ -150,40 +247,64 @@ class PerturbationGraph(object):
             name of the compound to be removed from the graph
 
         """
-        self._graph.remove_node(compound)
-        self._compoundList = self._graph.nodes()
+        if compound not in self._compactGraph.index:
+            raise nx.NetworkXError("The node %s is not in the graph." % compound)
+        # the cycles through the compound are gone, the incidence is rebuilt when it is needed next
+        self._cycleIncidence = None
+        replicates = self._edgeReplicates
+        if replicates is None:
+            self._set_graph(self._compactGraph.remove_nodes([compound]))
+        else:
+            # the replicate statistics of the remaining edges are kept for data added later
+            replicates.remove_nodes([compound])
+            self._set_graph(replicates.graph(), replicates=replicates)
+
+    def _read_symmetrized_graph(self, filename, delimiter, comments, nodetype, data):
+        r"""reads a network file into a symmetrised CompactGraph, the numpy parser (and the cache, if there is one)
+        is used unless nodetype or data differ from the default compound names with weight and error
+        Returns
+        -------
+        graph : CompactGraph
+            symmetrised graph, if an edge is listed more than once the last line is used
+        """
+        if nodetype is str and tuple(data) == (('weight', float), ('error', float)):
+            return read_edge_file(filename, delimiter=delimiter, comments=comments, cache_dir=self._cacheDir)
+        graph = nx.read_edgelist(filename, delimiter=delimiter, comments=comments, create_using=nx.DiGraph(),
+                                 nodetype=nodetype, data=data)
+        return self._symmetrize_graph(CompactGraph.from_networkx(graph))
+
+    def _set_graph(self, compact_graph, replicates=None):
+        r"""replaces the current graph, the networkx view of it is rebuilt the next time it is needed
+        Parameters
+        ----------
+        compact_graph : CompactGraph
+            array backed perturbation graph
+        replicates : EdgeAccumulator
+            replicate statistics the edges of the graph were computed from
+            Default = None, i.e. every edge of the graph counts as a single replicate
+        """
+        self._compactGraph = compact_graph
+        self._edgeReplicates = replicates
+        self._graph = None
+        # every change of the graph gets a new version, the fingerprint is only recomputed for a new version
+        self._graphVersion += 1
+        self._fingerprint = None
+        self._components = None
+        self._compoundList = np.sort(compact_graph.names)
 
     def _symmetrize_graph(self, graph):
         r"""symmetrises the graph and computes backward and forward averages where  given. 
         Parameters
         ----------
-        graph : networkx graph
-            directed networkx graph
+        graph : CompactGraph
+            directed array backed graph
 
         Returns
         -------
-        graph : networkx graph
+        graph : CompactGraph
             returns directed graph where, if not both a forward and backward edge are present a symmetrized reverse edge is included
         """
-        symmetrizedGraph = nx.DiGraph()
-        for u, v, w_forward in graph.edges(data=True):
-            if graph.has_edge(v, u):
-                w_backward = graph.get_edge_data(v, u)
-                avg_weight_forw = np.mean([w_forward['weight'], -w_backward['weight']])
-                avg_weight_back = -avg_weight_forw
-                error = np.std([w_forward['weight'], -w_backward['weight']]) / np.sqrt(2.0)
-                if error == 0:
-                    error = np.mean([w_forward['error'], -w_backward['error']])
-                symmetrizedGraph.add_edge(u, v, weight=avg_weight_forw, error=error)
-                symmetrizedGraph.add_edge(v, u, weight=avg_weight_back, error=error)
-            else:
-                symmetrizedGraph.add_edge(u, v, weight=w_forward['weight'], error=w_forward['error'])
-        for u, v, w in symmetrizedGraph.edges(data=True):
-            if not symmetrizedGraph.has_edge(v, u):
-                assymetric_w = -w['weight']
-                assymetric_e = -w['error']
-                symmetrizedGraph.add_edge(v, u, weight=assymetric_w, error=assymetric_e)
-        return symmetrizedGraph
+        return symmetrize(graph)
 
     def format_free_energies(self, merge_BM=False, kT=0.594, intermed_ID=None, compound_order=None, weighted=True,
                              path_dictionary=None):
@@ -207,8 +328,7 @@ class PerturbationGraph(object):
         weighted : boolean
             use weighted or none error weighted paths
         """
-        if self._free_energies:
-            self._free_energies = []
+        self._free_energies = FreeEnergyTable([], [], [])
         mols = {}
         if weighted:
             if not self._weightedPathAverages and path_dictionary == None:
@@ -223,16 +343,10 @@ class PerturbationGraph(object):
                 print('compute path averages for network first in order to format free energies')
                 sys.exit(1)
             else:
-                freeEnergies = self._pathAveages
+                freeEnergies = self._pathAverages
 
-        for data in freeEnergies:
-            keys = list(data.keys())
-            if keys[0] != 'error':
-                mol = keys[0]
-            else:
-                mol = keys[1]
-            nrg = data[mol]
-            err = data['error']
+        table = FreeEnergyTable.from_dicts(freeEnergies)
+        for mol, nrg, err in zip(table.names, table.values.tolist(), table.errors.tolist()):
             if merge_BM:
                 elems = mol.split("_BM")
                 moln = elems[0]
@@ -253,6 +367,9 @@ class PerturbationGraph(object):
                 print ("Compounds are:")
                 print (ids)
                 sys.exit(1)
+        names = []
+        values = []
+        errors = []
         for mol in ids:
             if intermed_ID != None:
                 if mol.startswith(intermed_ID):
@@ -264,17 +381,17 @@ class PerturbationGraph(object):
                 errtot += err ** 2
             nrgtot = -kT * np.log(nrgtot)
             errtot = np.sqrt(errtot)
-            a = {}
-            a[mol] = nrgtot
-            a['error'] = errtot
-            self._free_energies.append(a)
+            names.append(mol)
+            values.append(nrgtot)
+            errors.append(errtot)
+        self._free_energies = FreeEnergyTable(names, values, errors)
 
     def write_free_energies(self, freeEnergies, filename=None, fmt=None):
         r"""Either write free energies to a file or std out
         Parameters
         ----------
-        freeEnergies : list of dictionaries
-            contains dictionaries with free energies and their errors
+        freeEnergies : FreeEnergyTable or list of dictionaries
+            free energies and their errors
         filename : string
             file to which free energies should be written
             default = None
@@ -286,13 +403,8 @@ class PerturbationGraph(object):
             f = open(filename, 'w')
         else:
             print ('#FREE ENERGIES ARE:')
-        for d in freeEnergies:
-            for k, v in iter(d.items()):
-                if k == 'error':
-                    error = v
-                else:
-                    r_energy_k = k
-                    r_energy_v = v
+        table = FreeEnergyTable.from_dicts(freeEnergies)
+        for r_energy_k, r_energy_v, error in zip(table.names, table.values.tolist(), table.errors.tolist()):
             if filename != None:
                 if fmt == None:
                     f.write('%s, %f, %f\n' % (r_energy_k, r_energy_v, error))
@@ -307,107 +419,578 @@ class PerturbationGraph(object):
             f.close()
 
     def shift_free_energies(self, shift_value=0.0):
-        for d in self.freeEnergies:
-            for k, v in iter(d.items()):
-                if k != 'error':
-                    d[k] = d[k] - shift_value
+        r"""subtracts shift_value from all free energies returned by freeEnergyInKcal
+        Parameters
+        ----------
+        shift_value : float
+            value subtracted from every free energy
+            Default = 0.0
+        """
+        values = self.freeEnergyInKcal.values
+        values -= shift_value
+
+    def _path_adjacency(self, target_node):
+        r"""integer indexed adjacency lists of the graph used by the path enumeration
+        Parameters
+        ----------
+        target_node : string
+            node from which paths are enumerated
 
-    def compute_average_paths(self, target_node):
+        Returns
+        -------
+        nodes : list
+            node names, the position in the list is the integer index of the node
+        index : dictionary
+            integer index of each node
+        adjacency : list of lists
+            for every node a list of (neighbour, weight, squared error) tuples of its outgoing edges
+        """
+        if target_node not in self._compactGraph.index:
+            raise nx.NodeNotFound('source node %s not in graph' % target_node)
+        return self._compactGraph.names, self._compactGraph.index, self._compactGraph.adjacency_lists()
+
+    def _accumulate_paths(self, target_node, max_length=None, k_best=None):
+        r"""streams all simple paths from the target node to every compound into a PathAccumulator
+        Parameters
+        ----------
+        target_node : string
+            node to which all possible paths are computed
+        max_length : integer
+            only use paths with at most max_length edges
+            Default = None
+        k_best : integer
+            only use the k_best paths with the lowest error for every compound
+            Default = None
+
+        Returns
+        -------
+        index : dictionary
+            integer index of each node in the accumulator
+        accumulator : PathAccumulator
+            path sums for every compound
+        """
+        nodes, index, adjacency = self._path_adjacency(target_node)
+        accumulator = PathAccumulator(len(nodes))
+        source = index[target_node]
+        if k_best is None:
+            # a single traversal from the target credits every compound on the way
+            stream_simple_paths(adjacency, source, None, accumulator, max_length=max_length)
+        else:
+            accumulator.add(source, 0.0, 0.0)
+            for n in self._compoundList:
+                if n == target_node:
+                    continue
+                paths = lowest_error_paths(adjacency, source, index[n], max_length=max_length)
+                for p, dg, error2 in itertools.islice(paths, k_best):
+                    accumulator.add(index[n], dg, error2)
+        count = accumulator.count
+        for n in self._compoundList:
+            if count[index[n]] == 0:
+                if max_length is None:
+                    raise nx.NetworkXNoPath('node %s not reachable from %s' % (n, target_node))
+                warnings.warn(UserWarning("No path with at most %d edges from %s to %s, %s is left out"
+                                          % (max_length, target_node, n, n)))
+        return index, accumulator
+
+    def compute_average_paths(self, target_node, max_length=None, k_best=None, references=None):
         r"""
         Parameters
         ----------
         target_node : string
             node to which all possible paths are computed
+        max_length : integer
+            only average over paths with at most max_length edges, compounds further away are left out
+            Default = None, i.e. all paths
+        k_best : integer
+            only average over the k_best paths with the lowest error to each compound. These are found with
+            Yen's algorithm rather than by enumerating all paths.
+            Default = None, i.e. all paths
+        references : list of Strings
+            reference compounds of the connected components of the network not containing the target node, see
+            compute_weighted_avg_paths
+            Default = None, i.e. the first compound in sorted order of every such component
         """
+        references = self._component_references(target_node, references)
+        if len(references) > 1:
+            # paths never leave a component, every component is averaged on its own
+            n_components, labels = connected_components(self._compactGraph)
+            graphs = split_components(self._compactGraph, labels)
+            index = self._compactGraph.index
+            tables = []
+            for r in references:
+                pG = PerturbationGraph(max_cached_results=0)
+                pG._set_graph(graphs[labels[index[r]]])
+                pG.compute_average_paths(r, max_length=max_length, k_best=k_best)
+                tables.append(pG.pathAverages)
+            self._weighted_paths = False
+            self._pathAverages = FreeEnergyTable([n for t in tables for n in t.names],
+                                                 np.concatenate([t.values for t in tables]),
+                                                 np.concatenate([t.errors for t in tables]))
+            return
         # Get all relative free energies with respect to node x
         self._weighted_paths = False
-        self._pathAverages = []
-        for n in self._compoundList:
-            paths = nx.shortest_simple_paths(self._graph, target_node, n)
-            err_list = []
-            sum_list = []
-            for p in paths:
-                sum = 0
-                error = 0.0
-                for node in range(len(p) - 1):
-                    sum = sum + self._graph.get_edge_data(p[node], p[node + 1])['weight']
-                    error = error + self._graph.get_edge_data(p[node], p[node + 1])['error'] ** 2
-                sum_list.append(sum)
-                err_list.append(error)
-                error = np.sqrt(error)
-                # print r'DDG for path %s is %f +/- %f kcal/mol' %(p, sum, error)
-            avg_sum = np.mean(np.array(sum_list))
-            avg_err = np.mean(np.array(err_list))
-            avg_std = np.std(np.array(sum_list))
-            # print ("Average sum for path to %s is %f " %(n,avg_sum))
-            a = {str(n): avg_sum}
-            a['error'] = avg_std
-            # a['error']=sqrt(avg_err)
-            self._pathAverages.append(a)
-
-    def compute_weighted_avg_paths(self, target_node):
+        index, accumulator = self._accumulate_paths(target_node, max_length=max_length, k_best=k_best)
+        nodes = [n for n in self._compoundList if accumulator.count[index[n]] > 0]
+        ids = [index[n] for n in nodes]
+        self._pathAverages = FreeEnergyTable([str(n) for n in nodes], accumulator.mean[ids], accumulator.std[ids])
+
+    def compute_weighted_avg_paths(self, target_node, method='paths', max_length=None, k_best=None, references=None,
+                                   n_jobs=1):
         r""" computes all possible paths to a target node and returns a weighted average based on the errors along the edges of the path
         Parameters
         ----------
         target_node : string
             string name of the target node as defined in the networkx graph
+        method : string
+            'paths' averages over all simple paths from the target node to each compound, 'mle' estimates all free
+            energies at once as a weighted least-squares fit to the edges of the network, which scales polynomially
+            with the number of edges and also gives the full covariance of the free energies (see nodeCovariance)
+            Default = 'paths'
+        max_length : integer
+            only average over paths with at most max_length edges, compounds further away are left out.
+            Only used with method='paths'.
+            Default = None, i.e. all paths
+        k_best : integer
+            only average over the k_best paths with the lowest error to each compound. These are found with
+            Yen's algorithm rather than by enumerating all paths. Only used with method='paths'.
+            Default = None, i.e. all paths
+        references : list of Strings
+            reference compounds of the connected components of the network not containing the target node, at
+            most one per component. The free energies of every component are relative to its reference.
+            Default = None, i.e. the first compound in sorted order of every such component
+        n_jobs : integer
+            number of worker processes the connected components are solved in
+            Default = 1
         """
+        if method not in ('paths', 'mle'):
+            raise ValueError("Unknown method %s, use either 'paths' or 'mle'" % method)
+        if method == 'mle':
+            max_length = None
+            k_best = None
+        self._mleTarget = target_node if method == 'mle' else None
+        self._mleReferences = list(references) if method == 'mle' and references else None
+        self._componentReferences = self._component_references(target_node, references)
+        key_parts = (self.graphFingerprint, str(target_node), method, max_length, k_best)
+        if len(self._componentReferences) > 1:
+            key_parts += (tuple(self._componentReferences),)
+        key = self._resultCache.key(*key_parts)
+        cached = self._resultCache.get(key)
+        if cached is not None:
+            names, values, errors, covariance = cached
+            self._weighted_paths = True
+            self._nodeCovariance = covariance.copy() if covariance is not None else None
+            self._weightedPathAverages = FreeEnergyTable(names, values.copy(), errors.copy(), self._nodeCovariance)
+            return
+        if len(self._componentReferences) > 1:
+            self._compute_component_free_energies(method, max_length=max_length, k_best=k_best, n_jobs=n_jobs)
+        elif method == 'mle':
+            self._compute_mle_free_energies(target_node)
+        else:
+            self._compute_path_free_energies(target_node, max_length=max_length, k_best=k_best)
+        table = self._weightedPathAverages
+        covariance = self._nodeCovariance.copy() if self._nodeCovariance is not None else None
+        self._resultCache.put(key, table.names, table.values.copy(), table.errors.copy(), covariance)
+
+    def _component_references(self, target_node, references=None):
+        r"""reference compound of every connected component, the component of the target node comes first
+        Parameters
+        ----------
+        target_node : string
+            reference compound of its component
+        references : list of Strings
+            reference compounds of other components
+            Default = None
+
+        Returns
+        -------
+        references : list of Strings
+            one reference per component, the target node first and the other components in the order of components
+        """
+        if target_node not in self._compactGraph.index:
+            raise nx.NodeNotFound('source node %s not in graph' % target_node)
+        components = self.components
+        if len(components) == 1 and not references:
+            return [target_node]
+        component = {}
+        for c, compounds in enumerate(components):
+            for n in compounds:
+                component[n] = c
+        chosen = [None] * len(components)
+        chosen[component[target_node]] = target_node
+        for r in references or []:
+            if r not in component:
+                raise nx.NodeNotFound('reference node %s not in graph' % r)
+            c = component[r]
+            if chosen[c] is not None and chosen[c] != r:
+                raise ValueError('%s and %s are in the same connected component, give one reference per component'
+                                 % (chosen[c], r))
+            chosen[c] = r
+        missing = [c for c in range(len(components)) if chosen[c] is None]
+        for c in missing:
+            chosen[c] = components[c][0]
+        if missing:
+            warnings.warn(UserWarning("The network has %d connected components, the free energies of compounds not "
+                                      "connected to %s are relative to %s" % (len(components), target_node,
+                                                                              [chosen[c] for c in missing])))
+        first = component[target_node]
+        return [chosen[first]] + [chosen[c] for c in range(len(components)) if c != first]
+
+    def _compute_component_free_energies(self, method, max_length=None, k_best=None, n_jobs=1):
+        r"""solves every connected component of the network on its own with the references of
+        componentReferences, in n_jobs worker processes
+        Parameters
+        ----------
+        method : string
+            'paths' or 'mle', see compute_weighted_avg_paths
+        max_length : integer
+            only average over paths with at most max_length edges
+            Default = None
+        k_best : integer
+            only average over the k_best paths with the lowest error to each compound
+            Default = None
+        n_jobs : integer
+            number of worker processes
+            Default = 1
+        """
+        n_components, labels = connected_components(self._compactGraph)
+        graphs = split_components(self._compactGraph, labels)
+        index = self._compactGraph.index
+        graphs = [graphs[labels[index[r]]] for r in self._componentReferences]
+        n = len(graphs)
+        arguments = (graphs, self._componentReferences, [method] * n, [max_length] * n, [k_best] * n)
+        if n_jobs > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(executor.map(_component_free_energies, *arguments))
+        else:
+            results = list(map(_component_free_energies, *arguments))
+        self._weighted_paths = True
+        covariances = [r[3] for r in results]
+        if method == 'mle' and sum(len(r[0]) for r in results) <= DENSE_COVARIANCE_SIZE:
+            # free energies of different components are uncorrelated
+            self._nodeCovariance = scipy.linalg.block_diag(*covariances)
+        else:
+            self._nodeCovariance = None
+        self._weightedPathAverages = FreeEnergyTable([n for r in results for n in r[0]],
+                                                     np.concatenate([r[1] for r in results]),
+                                                     np.concatenate([r[2] for r in results]), self._nodeCovariance)
+
+    def _compute_path_free_energies(self, target_node, max_length=None, k_best=None):
+        r"""error weighted average over the simple paths from the target node to every compound
+        Parameters
+        ----------
+        target_node : string
+            string name of the target node as defined in the networkx graph
+        max_length : integer
+            only average over paths with at most max_length edges
+            Default = None
+        k_best : integer
+            only average over the k_best paths with the lowest error to each compound
+            Default = None
+        """
+        self._nodeCovariance = None
         # Get all relative free energies with respect to node x
         self._weighted_paths = True
-        self._weightedPathAverages = []
-        a = {target_node: 0.0}
-        a['error'] = 0.0
-        self._weightedPathAverages.append(a)
-        for n in self._compoundList:
-            if n == target_node:
-                continue
-            paths = list(nx.shortest_simple_paths(self._graph, target_node, n))
-            err_list = []
-            sum_list = []
-            for p in paths:
-                summing = 0
-                error = 0.0
-                for node in range(len(p) - 1):
-                    summing = summing + self._graph.get_edge_data(p[node], p[node + 1])['weight']
-                    error = error + self._graph.get_edge_data(p[node], p[node + 1])['error'] ** 2
-                sum_list.append(summing)
-                error = np.sqrt(error)
-                err_list.append(error)
-            err_list = np.array(err_list)
-            sum_weights = np.sum(1.0 / err_list)
-            path_weights = (1.0 / err_list) / sum_weights
-            avg_sum = 0.0
-            avg_err = 0.0
-            for i in range(len(sum_list)):
-                s = sum_list[i]
-                avg_sum = avg_sum + (path_weights[i] * s)
-                avg_err = avg_err + path_weights[i] * err_list[i] ** 2
-            avg_err = np.sqrt(avg_err)
-            a = {str(n): avg_sum}
-            a['error'] = avg_err
-            self._weightedPathAverages.append(a)
-
-    def get_cycles(self, max_length=4, closure_threshold=1.0, print_all=False):
-        r"""
-        TODO: elaborate and find good way of saving this information 
-        """
-        # cycle closure
-        cyc = nx.simple_cycles(self._graph)
-        for c in cyc:
-            sum = 0
-            error = 0
-            if len(c) > 2:
-                sum = self._graph.get_edge_data(c[-1], c[0])['weight']
-                error = (self._graph.get_edge_data(c[-1], c[0])['error']) ** 2
-                for node in range(len(c) - 1):
-                    sum = sum + self._graph.get_edge_data(c[node], c[node + 1])['weight']
-                    error = error + (self._graph.get_edge_data(c[node], c[node + 1])['error']) ** 2
-                error = np.sqrt(error)
-                if len(c) <= max_length and not print_all:
-                    if sum > closure_threshold:
-                        print ('DDG for cycle %s is %.2f +/- %.2f kcal/mol' % (c, sum, error))
-                if print_all:
-                    print ('DDG for cycle %s is %.2f +/- %.2f kcal/mol' % (c, sum, error))
+        index, accumulator = self._accumulate_paths(target_node, max_length=max_length, k_best=k_best)
+        nodes = [n for n in self._compoundList if n != target_node and accumulator.count[index[n]] > 0]
+        ids = [index[n] for n in nodes]
+        self._weightedPathAverages = FreeEnergyTable([str(target_node)] + [str(n) for n in nodes],
+                                                     np.concatenate([[0.0], accumulator.weighted_mean[ids]]),
+                                                     np.concatenate([[0.0], accumulator.weighted_error[ids]]))
+
+    def _compute_mle_free_energies(self, target_node):
+        r"""weighted least-squares estimate of the free energies of all compounds relative to the target node
+        Parameters
+        ----------
+        target_node : string
+            string name of the target node as defined in the networkx graph
+        """
+        solver, index = self._mle_solver(target_node)
+        self._weighted_paths = True
+        # the dense covariance is only kept for maps small enough, see node_covariance for larger ones. The table gets
+        # copies, shift_free_energies changes its values in place and the solver is reused by the other analyses
+        self._nodeCovariance = solver.covariance.copy() if len(index) <= DENSE_COVARIANCE_SIZE else None
+        self._weightedPathAverages = FreeEnergyTable([str(n) for n in index], solver.free_energies.copy(),
+                                                     solver.errors, self._nodeCovariance)
+
+    def _mle_solver(self, target_node):
+        r"""solved NetworkSolver of the current graph with the target node as reference, the sparse factorisation is
+        reused until the graph changes. Only connected networks have a single solver, the components of other networks
+        are solved on their own by compute_weighted_avg_paths.
+        Parameters
+        ----------
+        target_node : string
+            string name of the target node as defined in the networkx graph
+
+        Returns
+        -------
+        solver : NetworkSolver
+            solved network, node 0 is the target node followed by the other compounds in sorted order
+        index : dictionary
+            position of every compound in the solver, in the order of the solver
+        """
+        key = (self._graphVersion, target_node)
+        if self._mleSolver is not None and self._mleSolverKey == key:
+            return self._mleSolver, self._mleIndex
+        graph = self._compactGraph
+        if target_node not in graph.index:
+            raise nx.NodeNotFound('source node %s not in graph' % target_node)
+        components = self.components
+        if len(components) > 1:
+            raise ValueError('The network has %d connected components %s, covariances and influences of the free '
+                             'energies are only available for a connected network' % (len(components), components))
+        nodes = [target_node] + [n for n in self._compoundList if n != target_node]
+        # position of every node of the graph in the list of results
+        position = np.empty(graph.n_nodes, dtype=np.int64)
+        position[[graph.index[n] for n in nodes]] = np.arange(len(nodes))
+        # the graph is symmetrised, so every perturbation only enters the fit once
+        undirected = graph.undirected_edges()
+        source = position[graph.source[undirected]]
+        sink = position[graph.sink[undirected]]
+        weight = graph.weight[undirected]
+        error = graph.error[undirected]
+        solver = NetworkSolver(len(nodes), source, sink, weight, error, reference=0)
+        try:
+            solver.solve()
+        except ValueError as e:
+            raise nx.NetworkXNoPath(str(e))
+        self._mleSolver = solver
+        self._mleSolverKey = key
+        self._mleIndex = {n: i for i, n in enumerate(nodes)}
+        return self._mleSolver, self._mleIndex
+
+    def _update_mle_solver(self, newGraph):
+        r"""applies the edges of newGraph, with their values merged into the current graph, to the kept solver of the
+        previous graph and keeps it for the current graph
+        Parameters
+        ----------
+        newGraph : CompactGraph
+            symmetrised graph with the added edges, all of its compounds are in the current graph
+        """
+        graph = self._compactGraph
+        undirected = newGraph.undirected_edges()
+        names = newGraph.names
+        source = [names[u] for u in newGraph.source[undirected].tolist()]
+        sink = [names[v] for v in newGraph.sink[undirected].tolist()]
+        ids = graph.edge_ids([graph.index[n] for n in source], [graph.index[n] for n in sink])
+        self._mleSolver.update_edges([self._mleIndex[n] for n in source], [self._mleIndex[n] for n in sink],
+                                     graph.weight[ids], graph.error[ids])
+        self._mleSolverKey = (self._graphVersion, self._mleTarget)
+
+    def _mle_positions(self, compounds):
+        if self._mleTarget is None:
+            raise ValueError("The covariance is only available after compute_weighted_avg_paths(method='mle')")
+        solver, index = self._mle_solver(self._mleTarget)
+        if compounds is None:
+            return solver, np.arange(len(index))
+        missing = [n for n in compounds if n not in index]
+        if missing:
+            raise KeyError('Compounds %s are not in the graph' % missing)
+        return solver, np.array([index[n] for n in compounds], dtype=np.int64)
+
+    def node_covariance(self, compounds=None, other_compounds=None):
+        r"""Block of the covariance of the free energies computed with compute_weighted_avg_paths(method='mle') for
+        the current graph, relative to the target node. Only the columns of the block are solved for with the sparse
+        factorisation of the normal equations, so this also works for maps too large for a dense covariance. The
+        network has to be connected.
+        Parameters
+        ----------
+        compounds : list of Strings
+            compounds of the rows of the block
+            Default = None, i.e. all compounds in the order of weightedPathAverages
+        other_compounds : list of Strings
+            compounds of the columns of the block
+            Default = None, i.e. the same compounds as the rows
+
+        Returns
+        -------
+        covariance : np.array
+            (len(compounds) x len(other_compounds)) covariance, the row and column of the target node are zero
+        """
+        solver, rows = self._mle_positions(compounds)
+        cols = rows if other_compounds is None else self._mle_positions(other_compounds)[1]
+        return solver.covariance_block(rows, cols)
+
+    def node_covariance_entries(self, compounds, other_compounds):
+        r"""Selected entries of the covariance of the free energies computed with
+        compute_weighted_avg_paths(method='mle'), see node_covariance
+        Parameters
+        ----------
+        compounds : list of Strings
+            first compound of every entry
+        other_compounds : list of Strings
+            second compound of every entry
+
+        Returns
+        -------
+        covariance : np.array
+            covariance of the free energies of compounds[i] and other_compounds[i]
+        """
+        if len(compounds) != len(other_compounds):
+            raise ValueError('compounds and other_compounds must have the same length')
+        solver, rows = self._mle_positions(compounds)
+        cols = self._mle_positions(other_compounds)[1]
+        return solver.covariance_entries(rows, cols)
+
+    def edge_influence(self, target_node=None):
+        r"""Leave-one-edge-out analysis of the weighted least-squares free energies, to find perturbations that pull
+        the estimates away from the rest of the network. The network is factorised once and every edge is left out
+        with a rank-one downdate of that factorisation, see NetworkSolver.edge_influence. The network has to be
+        connected.
+        Parameters
+        ----------
+        target_node : string
+            reference compound of the free energies
+            Default = None, i.e. the target of the last compute_weighted_avg_paths(method='mle')
+
+        Returns
+        -------
+        shifts : np.array
+            (n_edges x n_compounds) change of the free energy of every compound when the edge of the same row of
+            ranking is left out, columns in the order of weightedPathAverages. NaN for edges whose removal
+            disconnects the network.
+        ranking : np.array
+            structured array with the fields edge (tuple of compounds), influence (largest absolute shift of any
+            compound), residual (fitted minus measured free energy of the edge) and leverage, sorted by decreasing
+            influence, edges that disconnect the network come last
+        """
+        if target_node is None:
+            target_node = self._mleTarget
+        if target_node is None:
+            raise ValueError("Give a target_node or compute_weighted_avg_paths(method='mle') first")
+        solver, index = self._mle_solver(target_node)
+        shifts, residuals, leverages = solver.edge_influence()
+        names = [str(n) for n in index]
+        influence = np.max(np.abs(shifts), axis=1)
+        # NaN, i.e. disconnecting, edges are sorted last
+        order = np.argsort(-influence, kind='stable')
+        ranking = np.zeros(len(order), dtype=influence_dtype)
+        for i, e in enumerate(order.tolist()):
+            ranking['edge'][i] = (names[solver.source[e]], names[solver.sink[e]])
+        ranking['influence'] = influence[order]
+        ranking['residual'] = residuals[order]
+        ranking['leverage'] = leverages[order]
+        return shifts[order], ranking
+
+    def compound_influence(self, target_node=None):
+        r"""Leave-one-compound-out sweep of the weighted least-squares free energies. Every compound but the target
+        is left out in turn, without changing or copying the graph: the network is factorised once and each removal
+        is a block downdate of that factorisation, see NetworkSolver.compound_influence. The network has to be
+        connected.
+        Parameters
+        ----------
+        target_node : string
+            reference compound of the free energies
+            Default = None, i.e. the target of the last compute_weighted_avg_paths(method='mle')
+
+        Returns
+        -------
+        shifts : np.array
+            (n_compounds - 1 x n_compounds) change of the free energy of every compound when the compound of the
+            same row of report is left out, columns in the order of weightedPathAverages. NaN for the left out
+            compound and for compounds whose removal disconnects the network.
+        report : np.array
+            structured array with the fields compound, influence (largest absolute shift of any other compound),
+            edges (number of perturbations left out with it) and disconnects (whether leaving it out disconnects the
+            network, i.e. it is an articulation point), sorted by decreasing influence, disconnecting compounds come
+            last
+        """
+        if target_node is None:
+            target_node = self._mleTarget
+        if target_node is None:
+            raise ValueError("Give a target_node or compute_weighted_avg_paths(method='mle') first")
+        solver, index = self._mle_solver(target_node)
+        names = [str(n) for n in index]
+        nodes = np.arange(1, len(names))
+        undirected = nx.Graph()
+        undirected.add_nodes_from(range(len(names)))
+        undirected.add_edges_from(zip(solver.source.tolist(), solver.sink.tolist()))
+        articulation = set(nx.articulation_points(undirected))
+        disconnecting = np.array([n in articulation for n in nodes.tolist()], dtype=bool)
+        shifts = solver.compound_influence(nodes, disconnecting=disconnecting)
+        others = shifts.copy()
+        others[np.arange(len(nodes)), nodes] = 0.0
+        influence = np.max(np.abs(others), axis=1)
+        order = np.argsort(-influence, kind='stable')
+        report = np.zeros(len(order), dtype=compound_influence_dtype)
+        report['compound'] = [names[n] for n in nodes[order].tolist()]
+        report['influence'] = influence[order]
+        report['edges'] = [undirected.degree(n) for n in nodes[order].tolist()]
+        report['disconnects'] = disconnecting[order]
+        return shifts[order], report
+
+    def get_cycles(self, max_length=4, closure_threshold=1.0, print_all=False, basis=False):
+        r"""Cycle closures of the perturbation network, every undirected cycle is only enumerated once
+        Parameters
+        ----------
+        max_length : integer
+            maximum number of perturbations in a cycle, longer cycles are not enumerated
+            Default = 4
+        closure_threshold : float
+            only cycles whose closure free energy is larger than this in absolute value are returned
+            Default = 1.0
+        print_all : boolean
+            return all cycles regardless of their length and closure
+            Default = False
+        basis : boolean
+            only use the cycles of a fundamental cycle basis instead of enumerating all cycles, which needs work
+            proportional to the number of edges for very large maps. max_length is not used in this case.
+            Default = False
+
+        Returns
+        -------
+        closures : np.array
+            structured array with the fields cycle (tuple of compounds), length, closure and error, sorted by
+            decreasing absolute closure
+        """
+        graph = self._compactGraph
+        if basis:
+            cycles = cycle_basis(graph)
+        else:
+            cycles = undirected_cycles(graph, max_length=None if print_all else max_length)
+        closures = cycle_closures(graph, cycles)
+        if not print_all:
+            closures = closures[np.abs(closures['closure']) > closure_threshold]
+        return closures[np.argsort(-np.abs(closures['closure']), kind='stable')]
+
+    def build_cycle_incidence(self, max_length=4, basis=False):
+        r"""Enumerates the cycles of the network once and stores their sparse cycle/edge incidence matrix, which is
+        reused by evaluate_cycle_closures as long as add_data_to_graph only merges new data for existing perturbations
+        Parameters
+        ----------
+        max_length : integer
+            maximum number of perturbations in a cycle
+            Default = 4
+        basis : boolean
+            only use the cycles of a fundamental cycle basis, max_length is not used in this case
+            Default = False
+
+        Returns
+        -------
+        incidence : CycleIncidence
+            cycle/edge incidence of the network
+        """
+        graph = self._compactGraph
+        if basis:
+            cycles = cycle_basis(graph)
+        else:
+            cycles = undirected_cycles(graph, max_length=max_length)
+        self._cycleIncidence = CycleIncidence(graph, cycles)
+        self._cycleParameters = {'max_length': max_length, 'basis': basis}
+        return self._cycleIncidence
+
+    def evaluate_cycle_closures(self):
+        r"""Closures of all cycles of the stored cycle incidence for the current edge free energies, evaluated with
+        one sparse matrix-vector product. If needed, the incidence is built with the max_length and basis of the last
+        build_cycle_incidence, or its defaults. It is rebuilt after perturbations were added or compounds removed.
+
+        Returns
+        -------
+        closures : np.array
+            structured array with the fields cycle (tuple of compounds), length, closure and error
+        """
+        if self._cycleIncidence is None:
+            self.build_cycle_incidence(**self._cycleParameters)
+        return self._cycleIncidence.evaluate(self._compactGraph)
 
     def rename_compounds():
         warnings.warn(Not)('This function is not implemented yet')
@@ -415,15 +998,89 @@ class PerturbationGraph(object):
 
     @property
     def graph(self):
+        r"""
+        Return
+        ------
+        graph : networkx.DiGraph
+            networkx view of the perturbation graph, built from the array representation when it is first needed
+        """
+        if self._graph is None and self._compactGraph is not None:
+            self._graph = self._compactGraph.to_networkx()
         return self._graph
 
+    @property
+    def graphVersion(self):
+        r"""number of changes made to the graph, increases whenever data is added or compounds are removed"""
+        return self._graphVersion
+
+    @property
+    def graphFingerprint(self):
+        r"""sha256 hex digest of the nodes and edges of the graph, free energies computed for a graph with the same
+        fingerprint are reused"""
+        if self._compactGraph is None:
+            return None
+        if self._fingerprint is None:
+            self._fingerprint = graph_fingerprint(self._compactGraph)
+        return self._fingerprint
+
+    @property
+    def components(self):
+        r"""
+        Return
+        ------
+        components : list of lists of Strings
+            sorted compounds of every weakly connected component of the graph
+        """
+        if self._components is None:
+            n_components, labels = connected_components(self._compactGraph)
+            self._components = [sorted(g.names) for g in split_components(self._compactGraph, labels)]
+        return self._components
+
+    @property
+    def componentReferences(self):
+        r"""
+        Return
+        ------
+        componentReferences : list of Strings
+            reference compound of every connected component used by the last compute_weighted_avg_paths, in the
+            order the components appear in weightedPathAverages
+        """
+        return self._componentReferences
+
+    @property
+    def cycleIncidence(self):
+        r"""
+        Return
+        ------
+        cycleIncidence : CycleIncidence
+            cycle/edge incidence built by build_cycle_incidence, None if it was not built yet
+        """
+        return self._cycleIncidence
+
+    @property
+    def hysteresis(self):
+        r"""
+        Return
+        ------
+        hysteresis : dictionary
+            sum of the forward and backward free energy of every perturbation that was run in both directions,
+            keyed by the (node1, node2) tuple of the perturbation
+        """
+        graph = self._compactGraph
+        names = graph.names
+        selected = graph.undirected_edges() & np.isfinite(graph.hysteresis)
+        return {(names[u], names[v]): h for u, v, h in zip(graph.source[selected].tolist(),
+                                                           graph.sink[selected].tolist(),
+                                                           graph.hysteresis[selected].tolist())}
+
     @property
     def pathAverages(self):
         r"""
         Return
         ------
-        pathAverages : dictionary
-            dictionary containing averaged free energies for each path, with paths weighted in the same way 
+        pathAverages : FreeEnergyTable
+            averaged free energies for each compound, with paths weighted in the same way, iterating over it gives
+            dictionaries like {'FXR45': 0.0, 'error': 0.0}
         """
         return self._pathAverages
 
@@ -441,6 +1098,33 @@ class PerturbationGraph(object):
             else:
                 return self._pathAverages
 
+    @property
+    def nodeCovariance(self):
+        r"""
+        Return
+        ------
+        nodeCovariance : np.array
+            covariance matrix of the free energies computed with compute_weighted_avg_paths(method='mle'), rows and
+            columns follow the order of weightedPathAverages. None if the free energies were computed from paths or
+            the map has more than DENSE_COVARIANCE_SIZE compounds, see node_covariance for blocks of it.
+        """
+        return self._nodeCovariance
+
     @property
     def compoundList(self):
         return self._compoundList
+
+
+def _component_free_energies(graph, target_node, method, max_length, k_best):
+    r"""free energies of a single connected component, run in a worker process by compute_weighted_avg_paths
+
+    Returns
+    -------
+    free_energies : tuple
+        (names, values, errors, covariance or None) of the component
+    """
+    pG = PerturbationGraph(max_cached_results=0)
+    pG._set_graph(graph)
+    pG.compute_weighted_avg_paths(target_node, method=method, max_length=max_length, k_best=k_best)
+    table = pG.weightedPathAverages
+    return table.names, table.values, table.errors, pG.nodeCovariance
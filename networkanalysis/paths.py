@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# !/usr/bin/env python
+
+# This file is part of freenrgworkflows.
+#
+# Copyright 2016,2017 Julien Michel Lab, University of Edinburgh (UK)
+#
+# freenrgworkflows is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Antonia Mey"
+__email__ = "antonia.mey@ed.ac.uk"
+
+import heapq
+import math
+import numpy as np
+
+
+class PathAccumulator(object):
+    """Running sums over all paths ending in each node, so that path averages never need the paths themselves"""
+
+    def __init__(self, n_nodes):
+        r"""
+        Parameters
+        ----------
+        n_nodes : integer
+            number of nodes in the network, nodes are identified by integers 0..n_nodes-1
+        """
+        # plain lists, element access on them is much cheaper than on numpy arrays in the inner loop
+        self._count = [0] * n_nodes
+        self._mean = [0.0] * n_nodes
+        self._m2 = [0.0] * n_nodes
+        self._inv_error_sum = [0.0] * n_nodes
+        self._weighted_sum = [0.0] * n_nodes
+        self._error_sum = [0.0] * n_nodes
+
+    def add(self, node, dg, error2):
+        r"""adds a single path to the accumulators of its end node
+        Parameters
+        ----------
+        node : integer
+            index of the last node of the path
+        dg : float
+            sum of the free energies along the path
+        error2 : float
+            sum of the squared errors along the path
+        """
+        # Welford update for the unweighted mean and standard deviation of the path sums
+        self._count[node] += 1
+        delta = dg - self._mean[node]
+        self._mean[node] += delta / self._count[node]
+        self._m2[node] += delta * (dg - self._mean[node])
+        # paths are weighted by the inverse of their error
+        if error2 > 0.0:
+            error = math.sqrt(error2)
+            self._inv_error_sum[node] += 1.0 / error
+            self._weighted_sum[node] += dg / error
+            self._error_sum[node] += error
+
+    @property
+    def count(self):
+        r"""number of paths ending in each node"""
+        return np.array(self._count)
+
+    @property
+    def mean(self):
+        r"""unweighted average of the path free energies"""
+        return np.array(self._mean)
+
+    @property
+    def std(self):
+        r"""standard deviation of the path free energies"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(np.array(self._m2) / self.count)
+
+    @property
+    def weighted_mean(self):
+        r"""average of the path free energies, each path weighted by the inverse of its error"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.array(self._weighted_sum) / np.array(self._inv_error_sum)
+
+    @property
+    def weighted_error(self):
+        r"""square root of the weighted average of the squared path errors"""
+        # sum_i w_i err_i**2 with w_i = (1/err_i) / sum_j (1/err_j) reduces to sum_i err_i / sum_j (1/err_j)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(np.array(self._error_sum) / np.array(self._inv_error_sum))
+
+
+def stream_simple_paths(adjacency, source, destination, accumulator, max_length=None):
+    r"""Depth first enumeration of all simple paths from source to destination, adding each path to the accumulator
+    without ever storing it. The free energy and squared error of the current path prefix are carried down the
+    search stack, so shared prefixes are only summed once.
+
+    Parameters
+    ----------
+    adjacency : list of lists
+        for every node a list of (neighbour, weight, squared error) tuples of its outgoing edges
+    source : integer
+        index of the node all paths start from
+    destination : integer or None
+        index of the node all paths end in. If None a single traversal credits every simple path from the source to
+        any node, i.e. the path averages of all nodes are accumulated at once.
+    accumulator : PathAccumulator
+        accumulator to which every completed path is added
+    max_length : integer
+        only paths with at most max_length edges are enumerated, the search is pruned at this depth
+        Default = None, i.e. no limit
+    """
+    if source == destination or destination is None:
+        accumulator.add(source, 0.0, 0.0)
+        if source == destination:
+            return
+    if max_length is None:
+        max_length = len(adjacency)
+    on_path = [False] * len(adjacency)
+    on_path[source] = True
+    path = [source]
+    stack = [(iter(adjacency[source]), 0.0, 0.0)]
+    while stack:
+        children, dg, error2 = stack[-1]
+        for v, w, e2 in children:
+            if on_path[v]:
+                continue
+            if v == destination:
+                accumulator.add(v, dg + w, error2 + e2)
+                continue
+            if destination is None:
+                # every prefix of a simple path is itself a simple path to its last node
+                accumulator.add(v, dg + w, error2 + e2)
+            if len(path) >= max_length:
+                continue
+            on_path[v] = True
+            path.append(v)
+            stack.append((iter(adjacency[v]), dg + w, error2 + e2))
+            break
+        else:
+            stack.pop()
+            on_path[path.pop()] = False
+
+
+def _lowest_error_path(adjacency, source, destination, blocked_nodes, blocked_edges, max_length=None):
+    r"""Dijkstra search for the path with the smallest sum of squared edge errors, avoiding the blocked nodes and edges.
+    With a hop limit the search runs over (node, number of edges) states, so the lowest error path with at most
+    max_length edges is found without looking at longer paths.
+
+    Returns
+    -------
+    path : tuple or None
+        nodes of the path from source to destination, None if there is no such path
+    """
+    limited = max_length is not None
+    start = (source, 0) if limited else source
+    distance = {start: 0.0}
+    previous = {}
+    done = set()
+    # fewest edges with which every node was reached so far, states with more edges and no smaller error are skipped
+    fewest = {}
+    heap = [(0.0, 0, source)]
+    while heap:
+        d, h, u = heapq.heappop(heap)
+        state = (u, h) if limited else u
+        if state in done:
+            continue
+        if u == destination:
+            path = [u]
+            while state != start:
+                state = previous[state]
+                path.append(state[0] if limited else state)
+            return tuple(reversed(path))
+        done.add(state)
+        if limited:
+            if h >= fewest.get(u, max_length + 1) or h == max_length:
+                fewest[u] = min(h, fewest.get(u, h))
+                continue
+            fewest[u] = h
+        for v, w, e2 in adjacency[u]:
+            if v in blocked_nodes or (u, v) in blocked_edges:
+                continue
+            following = (v, h + 1) if limited else v
+            if following in done:
+                continue
+            if following not in distance or d + e2 < distance[following]:
+                distance[following] = d + e2
+                previous[following] = state
+                heapq.heappush(heap, (d + e2, h + 1, v))
+    return None
+
+
+def lowest_error_paths(adjacency, source, destination, max_length=None):
+    r"""Yen's k shortest simple paths from source to destination, with the squared edge errors as path length
+
+    Paths are generated lazily in order of increasing path error, so only as many paths are searched for as are
+    consumed by the caller.
+
+    Parameters
+    ----------
+    adjacency : list of lists
+        for every node a list of (neighbour, weight, squared error) tuples of its outgoing edges
+    source : integer
+        index of the node all paths start from
+    destination : integer
+        index of the node all paths end in
+    max_length : integer
+        only paths with at most max_length edges, every spur search is limited to the edges left
+        Default = None, i.e. no limit
+
+    Yields
+    ------
+    path : tuple
+        (nodes, dg, error2) with the nodes along the path, the sum of the free energies and of the squared errors
+    """
+    edges = {}
+    for u, nbrs in enumerate(adjacency):
+        for v, w, e2 in nbrs:
+            edges[(u, v)] = (w, e2)
+
+    def path_sums(nodes):
+        dg = 0.0
+        error2 = 0.0
+        for u, v in zip(nodes[:-1], nodes[1:]):
+            w, e2 = edges[(u, v)]
+            dg += w
+            error2 += e2
+        return dg, error2
+
+    path = _lowest_error_path(adjacency, source, destination, set(), set(), max_length)
+    if path is None:
+        return
+    accepted = [path]
+    candidates = []
+    seen = {path}
+    while True:
+        dg, error2 = path_sums(path)
+        yield path, dg, error2
+        for i in range(len(path) - 1):
+            root = path[:i + 1]
+            blocked_edges = set((p[i], p[i + 1]) for p in accepted if p[:i + 1] == root)
+            spur = _lowest_error_path(adjacency, path[i], destination, set(root[:-1]), blocked_edges,
+                                      None if max_length is None else max_length - i)
+            if spur is None:
+                continue
+            candidate = root[:-1] + spur
+            if candidate not in seen:
+                seen.add(candidate)
+                heapq.heappush(candidates, (path_sums(candidate)[1], len(candidate), candidate))
+        if not candidates:
+            return
+        path = heapq.heappop(candidates)[2]
+        accepted.append(path)
@@ -28,6 +28,8 @@ import matplotlib
 import seaborn as sns
 import copy
 import numpy as np
+import sys
+from .freeenergies import align_free_energies, common_compounds
 
 sns.set_style("ticks")
 sns.set_context("notebook", font_scale=2)
@@ -54,12 +56,7 @@ class FreeEnergyPlotter(object):
         self.labels = []
         self.compound_list = []
 
-        cl_exp = set().union(*(d.keys() for d in DDG_series1))
-        cl_comp = set().union(*(d.keys() for d in DDG_series2))
-        ids = list(set(cl_exp).intersection(cl_comp))
-        if 'error' in ids:
-            index = ids.index('error')
-            ids.pop(index)
+        ids = common_compounds(DDG_series1, DDG_series2)
         if compound_list is None:
             print (np.sort(ids))
             self.compound_list = np.sort(ids)
@@ -70,27 +67,10 @@ class FreeEnergyPlotter(object):
                 sys.exit(1)
             self.compound_list = compound_list
 
-        for e in self.compound_list:
-            s1 = False
-            s2 = False
-            for i in DDG_series1:
-                if e in i:
-                    data = []
-                    data.append(i[e])
-                    data.append(i['error'])
-                    self.dataseries1.append(data)
-                    s1 = True
-            for i in DDG_series2:
-                if e in i:
-                    data = []
-                    data.append(i[e])
-                    data.append(i['error'])
-                    self.dataseries2.append(data)
-                    s2 = True
-            if s1 and s2:
-                self.labels.append(e)
-        self.dataseries2 = np.array(self.dataseries2)
-        self.dataseries1 = np.array(self.dataseries1)
+        names, values1, errors1, values2, errors2 = align_free_energies(DDG_series1, DDG_series2, self.compound_list)
+        self.labels = names
+        self.dataseries1 = np.column_stack([values1, errors1])
+        self.dataseries2 = np.column_stack([values2, errors2])
 
     def plot_bar_plot(self, legend=('experimental', 'computed'),
                       colors=[sns.xkcd_rgb["pale red"], sns.xkcd_rgb["denim blue"]]):
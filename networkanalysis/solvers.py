@@ -0,0 +1,528 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# !/usr/bin/env python
+
+# This file is part of freenrgworkflows.
+#
+# Copyright 2016,2017 Julien Michel Lab, University of Edinburgh (UK)
+#
+# freenrgworkflows is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = "Antonia Mey"
+__email__ = "antonia.mey@ed.ac.uk"
+
+import numpy as np
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+import warnings
+
+# networks with more nodes than this only get selected blocks or entries of the covariance, never the dense matrix
+DENSE_COVARIANCE_SIZE = 2000
+# number of edge changes applied as low-rank updates of the factorisation before the network is factorised again
+MAX_UPDATE_RANK = 64
+# leave-one-out downdates with a leverage this close to one disconnect the network
+LEVERAGE_TOLERANCE = 1e-10
+
+
+class NetworkSolver(object):
+    """Weighted least-squares (maximum likelihood) estimate of all node free energies of a perturbation network"""
+
+    def __init__(self, n_nodes, source, sink, weight, error, reference=0, max_rank=MAX_UPDATE_RANK):
+        r"""
+        Parameters
+        ----------
+        n_nodes : integer
+            number of nodes in the network, nodes are identified by integers 0..n_nodes-1
+        source : array like of integers
+            index of the first node of every (undirected) edge
+        sink : array like of integers
+            index of the second node of every (undirected) edge
+        weight : array like of floats
+            free energy difference DG(sink) - DG(source) of every edge
+        error : array like of floats
+            error on the free energy difference of every edge
+        reference : integer
+            index of the node whose free energy is fixed to zero
+            Default = 0
+        max_rank : integer
+            number of edge changes applied with update_edges as low-rank updates before the network is factorised again
+            Default = MAX_UPDATE_RANK
+        """
+        self._n_nodes = int(n_nodes)
+        self._source = np.asarray(source, dtype=np.int64)
+        self._sink = np.asarray(sink, dtype=np.int64)
+        self._weight = np.asarray(weight, dtype=np.float64)
+        self._variance = self._edge_variances(np.asarray(error, dtype=np.float64))
+        self._reference = int(reference)
+        self._max_rank = int(max_rank)
+        self._free = np.delete(np.arange(self._n_nodes), self._reference)
+        # position of every node among the free nodes, -1 for the reference
+        self._free_position = np.full(self._n_nodes, -1, dtype=np.int64)
+        self._free_position[self._free] = np.arange(len(self._free))
+        self._edge_index = None
+        self._lu = None
+        self._rhs = None
+        self._reset_updates()
+        self._free_energies = None
+
+    def _reset_updates(self):
+        r"""forgets the low-rank updates and everything derived from the factorisation"""
+        # changed edges as free positions of their nodes (-1 for the reference) and change of their weight 1/variance
+        self._update_source = np.zeros(0, dtype=np.int64)
+        self._update_sink = np.zeros(0, dtype=np.int64)
+        self._update_weight = np.zeros(0)
+        # L0^-1 U padded with a zero row for the reference and the LU factor of C^-1 + U^T L0^-1 U
+        self._woodbury = None
+        self._base_covariance = None
+        self._base_variances = None
+        self._covariance = None
+
+    def _edge_variances(self, error, floor=None):
+        r"""squared edge errors, zero errors are replaced by the smallest non-zero error of the network"""
+        variance = error ** 2
+        zero = variance == 0.0
+        if np.any(zero):
+            if floor is None:
+                if np.all(zero):
+                    floor = 1.0
+                else:
+                    floor = np.min(variance[~zero])
+            warnings.warn(UserWarning(
+                "%d edges have a zero error, using an error of %f for them" % (np.sum(zero), np.sqrt(floor))))
+            variance[zero] = floor
+        return variance
+
+    def _incidence_matrix(self):
+        r"""sparse edge/node incidence matrix B with B[e, source] = -1 and B[e, sink] = +1"""
+        n_edges = len(self._weight)
+        rows = np.concatenate([np.arange(n_edges), np.arange(n_edges)])
+        cols = np.concatenate([self._source, self._sink])
+        vals = np.concatenate([-np.ones(n_edges), np.ones(n_edges)])
+        return scipy.sparse.csr_matrix((vals, (rows, cols)), shape=(n_edges, self._n_nodes))
+
+    def _check_connected(self):
+        adjacency = scipy.sparse.coo_matrix((np.ones(len(self._source)), (self._source, self._sink)),
+                                            shape=(self._n_nodes, self._n_nodes))
+        n_components, labels = scipy.sparse.csgraph.connected_components(adjacency, directed=False)
+        if n_components > 1:
+            unreachable = np.flatnonzero(labels != labels[self._reference])
+            raise ValueError('The perturbation network is not connected, nodes %s cannot be reached from node %d'
+                             % (unreachable.tolist(), self._reference))
+
+    def solve(self):
+        r"""Solves the weighted normal equations L x = B^T W dG with the reference node fixed to zero
+
+        Returns
+        -------
+        free_energies : np.array
+            free energy of every node relative to the reference node
+        """
+        self._check_connected()
+        incidence = self._incidence_matrix()
+        weights = scipy.sparse.diags(1.0 / self._variance)
+        laplacian = (incidence.T @ weights @ incidence).tocsc()
+        self._rhs = incidence.T @ (self._weight / self._variance)
+        reduced = laplacian[self._free, :][:, self._free].tocsc()
+        self._reset_updates()
+        self._lu = scipy.sparse.linalg.splu(reduced) if len(self._free) > 0 else None
+        self._update_free_energies()
+        return self._free_energies
+
+    def _update_free_energies(self):
+        self._free_energies = np.zeros(self._n_nodes)
+        if len(self._free) > 0:
+            self._free_energies[self._free] = self._solve_free(self._rhs[self._free])
+
+    def _solve_free(self, rhs):
+        r"""solves the normal equations for right-hand sides on the free nodes, the low-rank updates since the
+        factorisation are applied with the Woodbury identity (L0 + U C U^T)^-1 = L0^-1 - Z S^-1 Z^T with Z = L0^-1 U
+        and S = C^-1 + U^T Z"""
+        solution = self._lu.solve(rhs)
+        if self._woodbury is not None:
+            z, factor = self._woodbury
+            solution -= z[:-1] @ scipy.linalg.lu_solve(factor, z[:-1].T @ rhs)
+        return solution
+
+    def _edge_lookup(self):
+        r"""edge id of every node pair, keyed by min(node) * n_nodes + max(node)"""
+        if self._edge_index is None:
+            keys = np.minimum(self._source, self._sink) * self._n_nodes + np.maximum(self._source, self._sink)
+            self._edge_index = dict(zip(keys.tolist(), range(len(keys))))
+        return self._edge_index
+
+    def update_edges(self, source, sink, weight, error):
+        r"""Changes or adds edges and updates the free energies without factorising the network again. Every changed
+        edge weight is a rank-one update of the normal equations, which is applied with the Woodbury identity, so the
+        work is a few solves with the kept factorisation rather than a new one. After max_rank changed edges the
+        network is factorised again.
+
+        Parameters
+        ----------
+        source : array like of integers
+            index of the first node of every edge, the nodes must already be in the network
+        sink : array like of integers
+            index of the second node of every edge
+        weight : array like of floats
+            new free energy difference DG(sink) - DG(source) of every edge
+        error : array like of floats
+            new error on the free energy difference of every edge
+
+        Returns
+        -------
+        free_energies : np.array
+            updated free energy of every node relative to the reference node
+        """
+        source = np.asarray(source, dtype=np.int64)
+        sink = np.asarray(sink, dtype=np.int64)
+        weight = np.asarray(weight, dtype=np.float64)
+        if np.any(source < 0) or np.any(source >= self._n_nodes) or np.any(sink < 0) or np.any(sink >= self._n_nodes):
+            raise ValueError('Edges can only be updated between nodes of the network')
+        variance = self._edge_variances(np.asarray(error, dtype=np.float64), floor=np.min(self._variance))
+        # an edge given more than once gets its last value
+        keys = np.minimum(source, sink) * self._n_nodes + np.maximum(source, sink)
+        last = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+        source, sink, weight, variance, keys = source[last], sink[last], weight[last], variance[last], keys[last]
+        lookup = self._edge_lookup()
+        ids = np.array([lookup.get(k, -1) for k in keys.tolist()], dtype=np.int64)
+        new = ids < 0
+        ids[new] = len(self._weight) + np.arange(np.sum(new))
+        lookup.update(zip(keys[new].tolist(), ids[new].tolist()))
+        self._source = np.concatenate([self._source, source[new]])
+        self._sink = np.concatenate([self._sink, sink[new]])
+        self._weight = np.concatenate([self._weight, np.zeros(np.sum(new))])
+        old_variance = np.concatenate([self._variance, np.full(np.sum(new), np.inf)])
+        # free energies are stored in the orientation the edge was first given in
+        weight = np.where(self._source[ids] == source, weight, -weight)
+        old_weight = self._weight[ids]
+        self._weight[ids] = weight
+        self._variance = old_variance.copy()
+        self._variance[ids] = variance
+        self._free_energies = None
+        if self._lu is None:
+            return self.solve()
+        change = weight / variance - old_weight / old_variance[ids]
+        np.add.at(self._rhs, self._sink[ids], change)
+        np.subtract.at(self._rhs, self._source[ids], change)
+        delta = 1.0 / variance - 1.0 / old_variance[ids]
+        changed = delta != 0.0
+        if len(self._update_weight) + np.sum(changed) > self._max_rank:
+            return self.solve()
+        if np.any(changed):
+            self._add_low_rank(self._free_position[self._source[ids[changed]]],
+                               self._free_position[self._sink[ids[changed]]], delta[changed])
+        self._update_free_energies()
+        return self._free_energies
+
+    def _add_low_rank(self, source, sink, delta):
+        r"""appends rank-one updates delta b b^T of the reduced normal equations, b = e_sink - e_source on the free
+        nodes"""
+        rhs = np.zeros((len(self._free), len(delta)))
+        columns = np.arange(len(delta))
+        rhs[sink[sink >= 0], columns[sink >= 0]] = 1.0
+        rhs[source[source >= 0], columns[source >= 0]] = -1.0
+        z = np.vstack([self._lu.solve(rhs), np.zeros((1, len(delta)))])
+        if self._woodbury is not None:
+            z = np.hstack([self._woodbury[0], z])
+        self._update_source = np.concatenate([self._update_source, source])
+        self._update_sink = np.concatenate([self._update_sink, sink])
+        self._update_weight = np.concatenate([self._update_weight, delta])
+        # U^T Z from the rows of the end nodes of the changed edges, the padding row stands in for the reference
+        capacitance = np.diag(1.0 / self._update_weight) + z[self._update_sink] - z[self._update_source]
+        self._woodbury = (z, scipy.linalg.lu_factor(capacitance))
+        self._covariance = None
+
+    def _low_rank_block(self, rows, cols):
+        r"""Z S^-1 Z^T restricted to the given nodes, the change of the covariance by the low-rank updates"""
+        z, factor = self._woodbury
+        return z[self._free_position[rows]] @ scipy.linalg.lu_solve(factor, z[self._free_position[cols]].T)
+
+    def edge_influence(self, max_bytes=2 ** 26):
+        r"""Leave-one-edge-out change of all free energies, from Sherman-Morrison downdates of the factorised normal
+        equations. Leaving out edge e with incidence vector b, weight w = 1 / variance and free energy d shifts the
+        free energies by w (b^T x - d) / (1 - w b^T L^-1 b) L^-1 b, so all edges together need one solve with the
+        factorisation per edge, done in batches. Edges whose removal disconnects the network (bridges, with a
+        leverage w b^T L^-1 b of one) get NaN shifts.
+
+        Parameters
+        ----------
+        max_bytes : integer
+            memory used for the edges downdated at once
+            Default = 2 ** 26
+
+        Returns
+        -------
+        shifts : np.array
+            (n_edges x n_nodes) change of the free energy of every node when the edge is left out
+        residuals : np.array
+            fitted minus measured free energy difference of every edge
+        leverages : np.array
+            leverage w b^T L^-1 b of every edge, one for bridges
+        """
+        x = self.free_energies
+        n_edges = len(self._weight)
+        residuals = x[self._sink] - x[self._source] - self._weight
+        leverages = np.zeros(n_edges)
+        shifts = np.zeros((n_edges, self._n_nodes))
+        step = self._column_block(max_bytes)
+        for start in range(0, n_edges, step):
+            edges = np.arange(start, min(start + step, n_edges))
+            columns = np.arange(len(edges))
+            source = self._free_position[self._source[edges]]
+            sink = self._free_position[self._sink[edges]]
+            rhs = np.zeros((len(self._free), len(edges)))
+            rhs[sink[sink >= 0], columns[sink >= 0]] = 1.0
+            rhs[source[source >= 0], columns[source >= 0]] = -1.0
+            # L^-1 b of every edge, padded with a zero row for the reference
+            z = np.vstack([self._solve_free(rhs), np.zeros((1, len(edges)))]) if len(self._free) > 0 \
+                else np.zeros((1, len(edges)))
+            leverages[edges] = (z[sink, columns] - z[source, columns]) / self._variance[edges]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scale = residuals[edges] / self._variance[edges] / (1.0 - leverages[edges])
+            scale[leverages[edges] > 1.0 - LEVERAGE_TOLERANCE] = np.nan
+            shifts[np.ix_(edges, self._free)] = (z[:-1] * scale).T
+            shifts[edges[np.isnan(scale)], self._reference] = np.nan
+        return shifts, residuals, leverages
+
+    def compound_influence(self, nodes=None, disconnecting=None, max_bytes=2 ** 26):
+        r"""Leave-one-node-out change of all free energies, from block downdates of the factorised normal equations.
+        Leaving out node k removes its d incident edges and pins k to zero, a rank d + 1 change V C V^T of the
+        normal equations with V = [b_1 .. b_d, e_k] and C = diag(-w_1 .. -w_d, 1), which is applied with the
+        Woodbury identity. All nodes together need one solve with the factorisation per edge end and node, done in
+        batches.
+
+        Parameters
+        ----------
+        nodes : array like of integers
+            nodes to be left out one at a time, not the reference
+            Default = None, i.e. all nodes but the reference
+        disconnecting : array like of booleans
+            for every node of nodes whether leaving it out disconnects the network, e.g. articulation points. These
+            get NaN shifts, as the free energies of the parts not connected to the reference are undefined.
+            Default = None, i.e. no node disconnects the network
+        max_bytes : integer
+            memory used for the columns solved at once
+            Default = 2 ** 26
+
+        Returns
+        -------
+        shifts : np.array
+            (len(nodes) x n_nodes) change of the free energy of every node when the node of the row is left out,
+            NaN for the left out node itself
+        """
+        x = self.free_energies
+        nodes = self._free if nodes is None else np.asarray(nodes, dtype=np.int64)
+        if np.any(nodes == self._reference):
+            raise ValueError('The reference node %d cannot be left out' % self._reference)
+        if disconnecting is None:
+            disconnecting = np.zeros(len(nodes), dtype=bool)
+        disconnecting = np.asarray(disconnecting, dtype=bool)
+        # incident edges of every node in CSR form
+        ends = np.concatenate([self._source, self._sink])
+        order = np.argsort(ends, kind='stable')
+        incident = order % len(self._weight)
+        indptr = np.zeros(self._n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ends, minlength=self._n_nodes), out=indptr[1:])
+        degree = indptr[nodes + 1] - indptr[nodes]
+        shifts = np.full((len(nodes), self._n_nodes), np.nan)
+        x_free = np.append(x[self._free], 0.0)
+        step = self._column_block(max_bytes)
+        start = 0
+        while start < len(nodes):
+            # as many nodes as fit, at least one
+            stop = start + max(1, np.searchsorted(np.cumsum(degree[start:] + 1), step, side='right'))
+            batch = [i for i in range(start, stop) if not disconnecting[i]]
+            columns = [np.concatenate([incident[indptr[nodes[i]]:indptr[nodes[i] + 1]], [-1]]) for i in batch]
+            n_columns = sum(len(c) for c in columns)
+            rhs = np.zeros((len(self._free), n_columns))
+            offset = 0
+            for i, c in zip(batch, columns):
+                edges = c[:-1]
+                cols = offset + np.arange(len(edges))
+                source = self._free_position[self._source[edges]]
+                sink = self._free_position[self._sink[edges]]
+                rhs[sink[sink >= 0], cols[sink >= 0]] = 1.0
+                rhs[source[source >= 0], cols[source >= 0]] = -1.0
+                rhs[self._free_position[nodes[i]], offset + len(edges)] = 1.0
+                offset += len(c)
+            z_all = np.vstack([self._solve_free(rhs), np.zeros((1, n_columns))])
+            offset = 0
+            for i, c in zip(batch, columns):
+                edges = c[:-1]
+                z = z_all[:, offset:offset + len(c)]
+                offset += len(c)
+                source = self._free_position[self._source[edges]]
+                sink = self._free_position[self._sink[edges]]
+                k = self._free_position[nodes[i]]
+                # V^T applied to vectors on the free nodes, which are padded with a zero for the reference
+                capacitance = np.diag(np.append(-self._variance[edges], 1.0)) + np.vstack([z[sink] - z[source], z[[k]]])
+                y = x_free - z[:, :-1] @ (self._weight[edges] / self._variance[edges])
+                updated = y - z @ np.linalg.solve(capacitance, np.concatenate([y[sink] - y[source], y[[k]]]))
+                shifts[i, self._free] = updated[:-1] - x_free[:-1]
+                shifts[i, self._reference] = 0.0
+                shifts[i, nodes[i]] = np.nan
+            start = stop
+        return shifts
+
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def sink(self):
+        return self._sink
+
+    @property
+    def free_energies(self):
+        if self._free_energies is None:
+            self.solve()
+        return self._free_energies
+
+    def _covariance_columns(self, nodes):
+        r"""(n_nodes x len(nodes)) columns of the covariance of the factorised network, without low-rank updates"""
+        if self._lu is None and self._free_energies is None:
+            self.solve()
+        columns = np.zeros((self._n_nodes, len(nodes)))
+        position = self._free_position[nodes]
+        free = np.flatnonzero(position >= 0)
+        if len(free) > 0:
+            rhs = np.zeros((len(self._free), len(free)))
+            rhs[position[free], np.arange(len(free))] = 1.0
+            columns[np.ix_(self._free, free)] = self._lu.solve(rhs)
+        return columns
+
+    def _column_block(self, max_bytes):
+        return max(1, int(max_bytes // (8 * max(self._n_nodes, 1))))
+
+    def covariance_block(self, rows, cols=None, max_bytes=2 ** 26):
+        r"""Block of the covariance, only the columns that are asked for are solved for, so the dense covariance of
+        the whole network is never formed
+
+        Parameters
+        ----------
+        rows : array like of integers
+            nodes of the rows of the block
+        cols : array like of integers
+            nodes of the columns of the block
+            Default = None, i.e. the same nodes as the rows
+        max_bytes : integer
+            memory used for the columns solved at once
+            Default = 2 ** 26
+
+        Returns
+        -------
+        block : np.array
+            (len(rows) x len(cols)) covariance of the free energies of the nodes
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = rows if cols is None else np.asarray(cols, dtype=np.int64)
+        if self._covariance is not None:
+            return self._covariance[np.ix_(rows, cols)]
+        block = np.empty((len(rows), len(cols)))
+        step = self._column_block(max_bytes)
+        for start in range(0, len(cols), step):
+            block[:, start:start + step] = self._covariance_columns(cols[start:start + step])[rows]
+        if self._woodbury is not None:
+            block -= self._low_rank_block(rows, cols)
+        return block
+
+    def covariance_entries(self, rows, cols, max_bytes=2 ** 26):
+        r"""
+        Parameters
+        ----------
+        rows : array like of integers
+            first node of every entry
+        cols : array like of integers
+            second node of every entry
+        max_bytes : integer
+            memory used for the columns solved at once
+            Default = 2 ** 26
+
+        Returns
+        -------
+        entries : np.array
+            covariance of the free energies of every pair rows[i], cols[i]
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if self._covariance is not None:
+            return self._covariance[rows, cols]
+        entries = self._base_entries(rows, cols, max_bytes)
+        if self._woodbury is not None:
+            z, factor = self._woodbury
+            entries -= np.einsum('ij,ji->i', z[self._free_position[rows]],
+                                 scipy.linalg.lu_solve(factor, z[self._free_position[cols]].T))
+        return entries
+
+    def _base_entries(self, rows, cols, max_bytes=2 ** 26):
+        r"""entries of the covariance of the factorised network, without low-rank updates"""
+        # every distinct column is only solved for once
+        unique, inverse = np.unique(cols, return_inverse=True)
+        inverse = inverse.ravel()
+        entries = np.empty(len(rows))
+        step = self._column_block(max_bytes)
+        for start in range(0, len(unique), step):
+            selected = np.flatnonzero((inverse >= start) & (inverse < start + step))
+            columns = self._covariance_columns(unique[start:start + step])
+            entries[selected] = columns[rows[selected], inverse[selected] - start]
+        return entries
+
+    @property
+    def variances(self):
+        r"""variance of the free energy of every node, i.e. the diagonal of the covariance. The diagonal of the
+        factorised network is kept, so after low-rank updates only their correction is computed."""
+        if self._covariance is not None:
+            return np.diag(self._covariance).copy()
+        if self._base_variances is None:
+            if self._base_covariance is not None:
+                self._base_variances = np.diag(self._base_covariance).copy()
+            else:
+                nodes = np.arange(self._n_nodes)
+                self._base_variances = self._base_entries(nodes, nodes)
+        if self._woodbury is None:
+            return self._base_variances.copy()
+        z, factor = self._woodbury
+        z = z[self._free_position]
+        return self._base_variances - np.einsum('ij,ji->i', z, scipy.linalg.lu_solve(factor, z.T))
+
+    @property
+    def errors(self):
+        return np.sqrt(self.variances)
+
+    @property
+    def covariance(self):
+        r"""
+        Returns
+        -------
+        covariance : np.array
+            dense (n_nodes x n_nodes) covariance of the node free energies, the reference row and column are zero.
+            Use covariance_block or covariance_entries for large networks.
+        """
+        if self._covariance is None:
+            if self._free_energies is None:
+                self.solve()
+            if self._base_covariance is None:
+                self._base_covariance = np.zeros((self._n_nodes, self._n_nodes))
+                if len(self._free) > 0:
+                    inverse = self._lu.solve(np.eye(len(self._free)))
+                    inverse = 0.5 * (inverse + inverse.T)
+                    self._base_covariance[np.ix_(self._free, self._free)] = inverse
+            self._covariance = self._base_covariance
+            if self._woodbury is not None:
+                nodes = np.arange(self._n_nodes)
+                correction = self._low_rank_block(nodes, nodes)
+                self._covariance = self._base_covariance - 0.5 * (correction + correction.T)
+        return self._covariance
@@ -29,6 +29,12 @@ import networkx as nx
 import scipy.stats
 import copy
 import warnings
+from .bootstrap import ADAPTIVE_BLOCK_SIZE, BLOCK_SIZE, StreamingSummary, bootstrap_blocks
+from .freeenergies import align_free_energies
+
+# in exact mode the convergence of adaptive bootstraps is checked each time the number of samples grew by this factor,
+# so the quantiles of all samples are only computed a logarithmic number of times
+CONVERGENCE_CHECK_GROWTH = 1.25
 
 
 class freeEnergyStats(object):
@@ -45,12 +51,15 @@ class freeEnergyStats(object):
         self._tau_error = None
         self._mue_error = None
         self._compound_list = None
+        self._summaries = None
+        self._repeats_used = 0
 
         self.data_comp = None
         self.data_exp = None
         self._confidence_interval = 0.68
 
-    def generate_statistics(self, comp_data, exp_data, compound_list=None, repeats=1000):
+    def generate_statistics(self, comp_data, exp_data, compound_list=None, repeats=1000, seed=None, n_jobs=1,
+                            mode='exact', tolerance=None):
         r"""
         Parameters
         ----------
@@ -62,50 +71,83 @@ class freeEnergyStats(object):
         comound_list : list of strings
             list should contain dictionary keys of compounds to be compared statistically
         repeats : integer
-            number of times new samples are drawn from the gaussian distribution of the computational data
+            number of times new samples are drawn from the gaussian distribution of the computational data, all
+            samples are drawn at once and the statistics of all of them are computed with array operations
+        seed : integer
+            seed of the random numbers, the same seed gives the same results for any n_jobs
+            Default = None, i.e. seeded from the global numpy random state
+        n_jobs : integer
+            number of processes the samples are drawn and evaluated in
+            Default = 1
+        mode : string
+            'exact' keeps the statistics of every sample, 'streaming' only keeps running moments and a fixed size
+            quantile sketch of each statistic, so memory does not grow with repeats and the confidence bounds are
+            estimates
+            Default = 'exact'
+        tolerance : float
+            if given, samples are drawn in blocks until the Monte Carlo standard error of the lower and upper
+            confidence bound of every statistic is below tolerance, with repeats as the maximum number of samples.
+            The number of samples used is available as repeats_used.
+            Default = None, i.e. always draw repeats samples
         """
-        if compound_list == None:
-            cl_exp = set().union(*(d.keys() for d in exp_data))
-            cl_comp = set().union(*(d.keys() for d in comp_data))
-            compound_list = list(set(cl_exp).intersection(cl_comp))
-            if 'error' in compound_list:
-                index = compound_list.index('error')
-                compound_list.pop(index)
-            self._compound_list = compound_list
+        if mode not in ('exact', 'streaming'):
+            raise ValueError("Unknown mode %s, use either 'exact' or 'streaming'" % mode)
+        names, comp, comp_err, exp, exp_err = align_free_energies(comp_data, exp_data, compound_list)
+        self._compound_list = names if compound_list is None else compound_list
+        self.data_comp = np.column_stack([comp, comp_err]).tolist()
+        self.data_exp = exp.tolist()
+        data_comp = np.column_stack([comp, comp_err])
+        self._R = self._R2 = self._tau = self._mue = None
+        self._summaries = None
+        if mode == 'streaming':
+            self._summaries = dict((k, StreamingSummary()) for k in ('R', 'R2', 'tau', 'mue'))
         else:
-            self._compound_list = compound_list
-
-        self.data_comp = []
-        self.data_exp = []
-        self._R = []
-        self._R2 = []
-        self._tau = []
-        self._mue = []
-        for k in self._compound_list:
-            comp = next(item for item in comp_data if k in item)
-            exp = next(item for item in exp_data if k in item)
-            val = comp[k]
-            err = comp['error']
-            self.data_comp.append([val, err])
-            val = exp[k]
-            self.data_exp.append(val)
-        for i in range(repeats):
-            new_data = []
-            for i in range(len(self.data_comp)):
-                val = self.data_comp[i][0]
-                err = self.data_comp[i][1]
-                if err != 0.0:
-                    val2 = np.random.normal(val, err)
-                    new_data.append(val2)
+            buffers = dict((k, np.empty(repeats)) for k in ('R', 'R2', 'tau', 'mue'))
+        self._repeats_used = 0
+        next_check = 0
+        generator = bootstrap_blocks(data_comp[:, 0], data_comp[:, 1], self.data_exp, repeats, seed=seed,
+                                     n_jobs=n_jobs, block_size=BLOCK_SIZE if tolerance is None else ADAPTIVE_BLOCK_SIZE)
+        for R, tau, mue in generator:
+            start = self._repeats_used
+            self._repeats_used += len(R)
+            for k, v in (('R', R), ('R2', R ** 2), ('tau', tau), ('mue', mue)):
+                if mode == 'streaming':
+                    self._summaries[k].update(v)
                 else:
-                    new_data.append(val)
-            R2, R = self._calculate_r2(new_data, self.data_exp)
-            tau = self._calculate_tau(new_data, self.data_exp)
-            mue = self._calculate_mue(new_data, self.data_exp)
-            self._R.append(R)
-            self._R2.append(R2)
-            self._tau.append(tau)
-            self._mue.append(mue)
+                    buffers[k][start:self._repeats_used] = v
+            if tolerance is None or self._repeats_used < next_check:
+                continue
+            if mode == 'exact':
+                for k in buffers:
+                    setattr(self, '_' + k, buffers[k][:self._repeats_used])
+                next_check = int(np.ceil(CONVERGENCE_CHECK_GROWTH * self._repeats_used))
+            if self._converged(tolerance):
+                break
+        generator.close()
+        if mode == 'exact':
+            # copies release the unused part of the buffers if the bootstrap converged early
+            self._R, self._R2, self._tau, self._mue = [buffers[k][:self._repeats_used].copy()
+                                                       for k in ('R', 'R2', 'tau', 'mue')]
+
+    def _converged(self, tolerance):
+        r"""checks whether the Monte Carlo standard error of the confidence bounds of all statistics is below
+        tolerance. The standard error of the p quantile of n samples is estimated as (Q(p + d) - Q(p - d)) / 2 with
+        d = sqrt(p (1 - p) / n), the spread of the quantiles within one binomial standard deviation of p.
+        """
+        n = float(self._repeats_used)
+        for key in ('R', 'R2', 'tau', 'mue'):
+            for p in (1 - self.confidence_interval, self.confidence_interval):
+                d = np.sqrt(p * (1 - p) / n)
+                lower, upper = self._quantile(key, [max(p - d, 0.0), min(p + d, 1.0)])
+                # NaN statistics, e.g. of constant data, do not hold up convergence
+                if 0.5 * (upper - lower) > tolerance:
+                    return False
+        return True
+
+    def _quantile(self, key, q):
+        if self._summaries is not None:
+            return self._summaries[key].quantile(q)
+        return np.quantile(getattr(self, '_' + key), q)
 
     def _calculate_predictive_index(self, series1, series2):
         '''r This function needs to be implemented properly'''
@@ -165,6 +207,27 @@ class freeEnergyStats(object):
         upper = int(np.ceil(self.confidence_interval * len(sorted_data)))
         return [sorted_data[lower], sorted_data[upper]]
 
+    def _mean(self, key, data):
+        if self._summaries is not None:
+            return self._summaries[key].mean
+        return np.mean(data)
+
+    def _std(self, key, data):
+        if self._summaries is not None:
+            return self._summaries[key].std
+        return np.std(data)
+
+    def _median_confidence(self, key, data):
+        r"""[median, lower_bound, upper_bound] of a statistic, estimated from its quantile sketch in streaming mode"""
+        if self._summaries is not None:
+            return self._summaries[key].quantile([0.5, 1 - self.confidence_interval, self.confidence_interval])
+        return np.concatenate([[np.median(data)], self._confidence(data)])
+
+    @property
+    def repeats_used(self):
+        r"""number of samples drawn by the last call of generate_statistics"""
+        return self._repeats_used
+
     @property
     def confidence_interval(self):
         return self._confidence_interval
@@ -178,11 +241,11 @@ class freeEnergyStats(object):
 
     @property
     def R_mean(self):
-        return np.mean(self._R)
+        return self._mean('R', self._R)
 
     @property
     def R_std(self):
-        return np.std(self._R)
+        return self._std('R', self._R)
 
     @property
     def R_confidence(self):
@@ -192,17 +255,16 @@ class freeEnergyStats(object):
         confidence : np.array
             [median, lower_bound, upper_bound]
         """
-        self._R_error = self._confidence(self._R)
-        self._R_error = np.concatenate([[np.median(self._R)], self._R_error])
+        self._R_error = self._median_confidence('R', self._R)
         return self._R_error
 
     @property
     def R2_mean(self):
-        return np.mean(self._R2)
+        return self._mean('R2', self._R2)
 
     @property
     def R2_std(self):
-        return np.std(self._R2)
+        return self._std('R2', self._R2)
 
     @property
     def R2_confidence(self):
@@ -212,17 +274,16 @@ class freeEnergyStats(object):
         confidence : np.array
             [median, lower_bound, upper_bound]
         """
-        self._R2_error = self._confidence(self._R2)
-        self._R2_error = np.concatenate([[np.median(self._R2)], self._R2_error])
+        self._R2_error = self._median_confidence('R2', self._R2)
         return self._R2_error
 
     @property
     def tau_mean(self):
-        return np.mean(self._tau)
+        return self._mean('tau', self._tau)
 
     @property
     def tau_std(self):
-        return np.std(self._tau)
+        return self._std('tau', self._tau)
 
     @property
     def tau_confidence(self):
@@ -232,17 +293,16 @@ class freeEnergyStats(object):
         confidence : np.array
             [median, lower_bound, upper_bound]
         """
-        self._tau_error = self._confidence(self._tau)
-        self._tau_error = np.concatenate([[np.median(self._tau)], self._tau_error])
+        self._tau_error = self._median_confidence('tau', self._tau)
         return self._tau_error
 
     @property
     def mue_mean(self):
-        return np.mean(self._mue)
+        return self._mean('mue', self._mue)
 
     @property
     def mue_std(self):
-        return np.std(self._mue)
+        return self._std('mue', self._mue)
 
     @property
     def mue_confidence(self):
@@ -252,6 +312,5 @@ class freeEnergyStats(object):
         confidence : np.array
             [median, lower_bound, upper_bound]
         """
-        self._mue_error = self._confidence(self._mue)
-        self._mue_error = np.concatenate([[np.median(self._mue)], self._mue_error])
+        self._mue_error = self._median_confidence('mue', self._mue)
         return self._mue_error
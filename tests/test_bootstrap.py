@@ -0,0 +1,88 @@
+import pytest
+import numpy as np
+import scipy.stats
+from networkanalysis.bootstrap import *
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.RandomState(7)
+    reference = np.round(rng.normal(size=10), 1)
+    reference[4] = reference[2]
+    samples = np.round(rng.normal(size=(50, 10)), 1)
+    return samples, reference
+
+
+def test_sample_free_energies():
+    samples = sample_free_energies([1.0, 2.0, 3.0], [0.0, 0.5, 0.1], 1000)
+    assert (samples.shape == (1000, 3))
+    assert (np.all(samples[:, 0] == 1.0))
+    assert (pytest.approx(np.mean(samples[:, 1]), abs=0.1) == 2.0)
+
+
+def test_pearson_r(samples):
+    samples, reference = samples
+    expected = [scipy.stats.pearsonr(s, reference)[0] for s in samples]
+    np.testing.assert_allclose(pearson_r(samples, reference), expected, rtol=1e-12)
+
+
+def test_kendall_tau(samples):
+    samples, reference = samples
+    expected = [scipy.stats.kendalltau(s, reference)[0] for s in samples]
+    np.testing.assert_allclose(kendall_tau(samples, reference), expected, rtol=1e-12)
+
+
+def test_mean_unsigned_error(samples):
+    samples, reference = samples
+    expected = [np.mean(np.abs(s - reference)) for s in samples]
+    np.testing.assert_allclose(mean_unsigned_error(samples, reference), expected)
+
+
+@pytest.mark.parametrize('method', ['pairs', 'mergesort'])
+@pytest.mark.parametrize('n', [2, 5, 40, 100])
+def test_kendall_tau_methods(method, n):
+    rng = np.random.RandomState(n)
+    reference = np.round(rng.normal(size=n), 1)
+    samples = np.round(rng.normal(size=(30, n)), 1)
+    samples[0] = 1.0
+    expected = np.array([scipy.stats.kendalltau(s, reference)[0] for s in samples])
+    tau = kendall_tau(samples, reference, method=method, max_bytes=4096)
+    np.testing.assert_allclose(tau, expected, rtol=1e-12)
+
+
+def test_kendall_tau_unknown_method(samples):
+    with pytest.raises(ValueError):
+        kendall_tau(*samples, method='bubble')
+
+
+def test_bootstrap_statistics_reproducible(samples):
+    samples, reference = samples
+    values = samples[0]
+    errors = np.full(len(values), 0.3)
+    serial = bootstrap_statistics(values, errors, reference, 25000, seed=42)
+    parallel = bootstrap_statistics(values, errors, reference, 25000, seed=42, n_jobs=2)
+    for s, p in zip(serial, parallel):
+        assert (len(s) == 25000)
+        np.testing.assert_array_equal(s, p)
+    other = bootstrap_statistics(values, errors, reference, 25000, seed=43)
+    assert (not np.array_equal(serial[0], other[0]))
+
+
+def test_streaming_summary():
+    rng = np.random.RandomState(3)
+    values = rng.normal(size=50000)
+    summary = StreamingSummary()
+    for block in np.array_split(values, 7):
+        summary.update(block)
+    assert (summary.count == 50000)
+    assert (pytest.approx(summary.mean) == np.mean(values))
+    assert (pytest.approx(summary.std) == np.std(values))
+    q = [0.025, 0.16, 0.5, 0.84, 0.975]
+    np.testing.assert_allclose(summary.quantile(q), np.quantile(values, q), atol=0.01)
+    assert (len(summary._sketch._weights) <= 101)
+
+
+def test_quantile_sketch_empty():
+    sketch = QuantileSketch()
+    sketch.update([np.nan])
+    assert (np.isnan(sketch.quantile(0.5)))
@@ -0,0 +1,138 @@
+import pytest
+import numpy as np
+import networkanalysis.cache
+import networkanalysis.loaders
+from networkanalysis.cache import *
+from networkanalysis.loaders import read_edge_file
+from networkanalysis.networkanalysis import PerturbationGraph
+
+
+@pytest.fixture
+def graph_file(tmp_path):
+    f = tmp_path / 'graph.csv'
+    f.write_text(open('tests/io/graph.csv').read())
+    return str(f)
+
+
+def test_key(tmp_path, graph_file):
+    cache = GraphCache(str(tmp_path / 'cache'))
+    key = cache.key(graph_file, delimiter=',', comments='#')
+    assert (key == cache.key(graph_file, comments='#', delimiter=','))
+    assert (key != cache.key(graph_file, delimiter=';', comments='#'))
+    with open(graph_file, 'a') as f:
+        f.write('FXR17,FXR99,1.0,0.1\n')
+    assert (key != cache.key(graph_file, delimiter=',', comments='#'))
+
+
+def test_store_load(tmp_path, graph_file):
+    cache = GraphCache(str(tmp_path / 'cache'))
+    assert (cache.load('missing') is None)
+    graph = read_edge_file(graph_file)
+    cache.store('graph', graph)
+    loaded = cache.load('graph')
+    assert (loaded.names == graph.names)
+    np.testing.assert_array_equal(loaded.source, graph.source)
+    np.testing.assert_array_equal(loaded.sink, graph.sink)
+    np.testing.assert_array_equal(loaded.weight, graph.weight)
+    np.testing.assert_array_equal(loaded.error, graph.error)
+    np.testing.assert_array_equal(loaded.hysteresis, graph.hysteresis)
+
+
+def test_cache_hit_skips_parsing(tmp_path, graph_file, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    graph = read_edge_file(graph_file, cache_dir=cache_dir)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('file parsed again')
+
+    monkeypatch.setattr(networkanalysis.loaders, 'parse_edge_file', fail)
+    monkeypatch.setattr(networkanalysis.loaders, 'symmetrize', fail)
+    pG = PerturbationGraph(cache_dir=cache_dir)
+    pG.populate_pert_graph(graph_file)
+    np.testing.assert_array_equal(pG._compactGraph.weight, graph.weight)
+    with pytest.raises(AssertionError):
+        read_edge_file(graph_file, delimiter=';', cache_dir=cache_dir)
+
+
+def test_result_cache_lru(tmp_path):
+    cache = ResultCache(maxsize=2)
+    cache.put('a', ['x'], [1.0], [0.1])
+    cache.put('b', ['x'], [2.0], [0.1])
+    cache.get('a')
+    cache.put('c', ['x'], [3.0], [0.1])
+    assert ('a' in cache and 'c' in cache and 'b' not in cache)
+    assert (cache.get('b') is None)
+    disk = ResultCache(maxsize=1, directory=str(tmp_path))
+    disk.put('a', ['x', 'y'], [0.0, 1.0], [0.0, 0.1], np.eye(2))
+    disk.put('b', ['x'], [2.0], [0.1])
+    names, values, errors, covariance = disk.get('a')
+    assert (names == ['x', 'y'])
+    np.testing.assert_array_equal(values, [0.0, 1.0])
+    np.testing.assert_array_equal(covariance, np.eye(2))
+    assert (disk.get('b')[3] is None)
+
+
+def test_memoised_free_energies(tmp_path, monkeypatch):
+    pG = PerturbationGraph(cache_dir=str(tmp_path))
+    pG.populate_pert_graph('tests/io/graph.csv')
+    pG.compute_weighted_avg_paths('FXR17', method='mle')
+    expected = pG.weightedPathAverages
+    covariance = pG.nodeCovariance.copy()
+    # changing the handed out covariance does not change the cached one
+    pG.nodeCovariance[:] = 0.0
+    version = pG.graphVersion
+
+    def fail(*args, **kwargs):
+        raise AssertionError('free energies computed again')
+
+    monkeypatch.setattr(PerturbationGraph, '_compute_mle_free_energies', fail)
+    pG.compute_weighted_avg_paths('FXR17', method='paths')
+    pG.compute_weighted_avg_paths('FXR17', method='mle')
+    assert (pG.weightedPathAverages == expected)
+    np.testing.assert_array_equal(pG.nodeCovariance, covariance)
+    # a new graph object finds the result on disk
+    other = PerturbationGraph(cache_dir=str(tmp_path))
+    other.populate_pert_graph('tests/io/graph.csv')
+    other.compute_weighted_avg_paths('FXR17', method='mle')
+    assert (other.weightedPathAverages == expected)
+    # changing the graph invalidates the result
+    pG.add_data_to_graph('tests/io/summary_r1.csv')
+    assert (pG.graphVersion == version + 1)
+    with pytest.raises(AssertionError):
+        pG.compute_weighted_avg_paths('FXR17', method='mle')
+
+
+def test_fingerprint_integer_nodes(tmp_path):
+    filename = tmp_path / 'int.csv'
+    filename.write_text('1,2,1.0,0.1\n2,3,1.0,0.1\n1,3,2.3,0.1\n')
+    pG = PerturbationGraph()
+    pG.populate_pert_graph(str(filename), nodetype=int)
+    pG.compute_weighted_avg_paths(1, method='mle')
+    assert (len(pG.weightedPathAverages) == 3)
+    # the same names as strings are a different graph
+    other = PerturbationGraph()
+    other.populate_pert_graph(str(filename))
+    assert (other.graphFingerprint != pG.graphFingerprint)
+
+
+def test_result_version(tmp_path, monkeypatch):
+    cache = ResultCache(directory=str(tmp_path))
+    key = cache.key('fingerprint', 'a', 'mle', None, None)
+    assert (key == cache.key('fingerprint', 'a', 'mle', None, None))
+    cache.put(key, ['a'], [0.0], [0.0])
+    monkeypatch.setattr(networkanalysis.cache, 'RESULT_VERSION', RESULT_VERSION + 1)
+    assert (cache.key('fingerprint', 'a', 'mle', None, None) != key)
+    # results computed by an older version are not found on disk
+    pG = PerturbationGraph(cache_dir=str(tmp_path / 'results'))
+    pG.populate_pert_graph('tests/io/graph.csv')
+    pG.compute_weighted_avg_paths('FXR17', method='mle')
+    monkeypatch.setattr(networkanalysis.cache, 'RESULT_VERSION', RESULT_VERSION + 2)
+    other = PerturbationGraph(cache_dir=str(tmp_path / 'results'))
+    other.populate_pert_graph('tests/io/graph.csv')
+
+    def fail(*args, **kwargs):
+        raise AssertionError('free energies computed again')
+
+    monkeypatch.setattr(PerturbationGraph, '_compute_mle_free_energies', fail)
+    with pytest.raises(AssertionError):
+        other.compute_weighted_avg_paths('FXR17', method='mle')
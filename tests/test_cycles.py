@@ -0,0 +1,72 @@
+import pytest
+import numpy as np
+import networkx as nx
+from networkanalysis.graphcore import *
+from networkanalysis.cycles import *
+
+
+@pytest.fixture
+def graph():
+    # two triangles a-b-c and b-c-d sharing the edge b-c, plus the square a-b-d-c around them
+    edges = [('a', 'b', 1.0), ('b', 'c', 1.0), ('a', 'c', 2.5), ('b', 'd', 0.5), ('c', 'd', -0.5)]
+    return symmetrize(CompactGraph.from_edges([e[0] for e in edges], [e[1] for e in edges],
+                                              [e[2] for e in edges], [0.1] * len(edges)))
+
+
+def test_undirected_cycles(graph):
+    cycles = undirected_cycles(graph)
+    assert (len(cycles) == 3)
+    assert (len(set(frozenset(c) for c in cycles)) == 3)
+
+
+def test_undirected_cycles_max_length(graph):
+    assert (len(undirected_cycles(graph, max_length=3)) == 2)
+
+
+def test_cycle_basis(graph):
+    cycles = cycle_basis(graph)
+    # number of edges - number of nodes + number of components
+    assert (len(cycles) == 2)
+    for c in cycles:
+        for u, v in zip(c, c[1:] + c[:1]):
+            assert (graph.edge_ids([u], [v])[0] >= 0)
+
+
+def test_cycle_closures(graph):
+    closures = cycle_closures(graph, undirected_cycles(graph, max_length=3))
+    abc = [c for c in closures if set(c['cycle']) == set(['a', 'b', 'c'])][0]
+    assert (pytest.approx(abs(abc['closure'])) == 0.5)
+    assert (pytest.approx(abc['error']) == np.sqrt(3) * 0.1)
+    assert (abc['length'] == 3)
+    bcd = [c for c in closures if set(c['cycle']) == set(['b', 'c', 'd'])][0]
+    assert (pytest.approx(bcd['closure']) == 0.0)
+
+
+def test_empty_closures(graph):
+    assert (len(cycle_closures(graph, [])) == 0)
+
+
+def test_cycle_incidence(graph):
+    incidence = CycleIncidence(graph, undirected_cycles(graph))
+    assert (incidence.matrix.shape == (3, 5))
+    assert (len(incidence.edges) == 5)
+    # every row of a cycle sums its edges with a +1/-1 orientation
+    np.testing.assert_array_equal(np.sort(np.abs(incidence.matrix).sum(axis=1).A1), [3, 3, 4])
+    closures = incidence.evaluate(graph)
+    reference = cycle_closures(graph, undirected_cycles(graph))
+    np.testing.assert_allclose(closures['closure'], reference['closure'])
+
+
+def test_cycle_incidence_reuse(graph):
+    incidence = CycleIncidence(graph, undirected_cycles(graph, max_length=3))
+    # same compounds, different free energies and a different node order
+    edges = [('b', 'a', -2.0), ('b', 'c', 1.0), ('a', 'c', 2.5), ('b', 'd', 0.5), ('c', 'd', -0.5)]
+    other = symmetrize(CompactGraph.from_edges([e[0] for e in edges], [e[1] for e in edges],
+                                               [e[2] for e in edges], [0.2] * len(edges)))
+    closures = incidence.evaluate(other)
+    abc = [c for c in closures if set(c['cycle']) == set(['a', 'b', 'c'])][0]
+    assert (pytest.approx(abs(abc['closure'])) == 0.5)
+    assert (pytest.approx(abc['error']) == np.sqrt(3) * 0.2)
+    # removed compounds give NaN closures for their cycles
+    closures = incidence.evaluate(other.remove_nodes(['d']))
+    assert (np.sum(np.isnan(closures['closure'])) == 1)
@@ -31,6 +31,11 @@ def test_read_comp_data_kj(ExpData300):
     ExpData300.read_free_energies(filename, kcal=True)
     assert (ExpData300.freeEnergiesInKcal[-1]['FXR100'] == 7.01744151024)
     assert (ExpData300.freeEnergiesInKcal[-1]['error'] == 0.206262061369)
+    kJ = ExpData300.freeEnergiesInKJmol
+    assert (type(kJ) == type(ExpData300.freeEnergiesInKcal))
+    assert (kJ.names == ExpData300.freeEnergiesInKcal.names)
+    assert (pytest.approx(kJ[-1]['FXR100']) == 4.184 * 7.01744151024)
+    assert (pytest.approx(kJ[-1]['error']) == 4.184 * 0.206262061369)
 
 
 def test_keys(ExpData300):
@@ -0,0 +1,74 @@
+import pytest
+import copy
+import numpy as np
+from networkanalysis.freeenergies import *
+
+
+@pytest.fixture
+def series():
+    comp = [{'a': 0.5, 'error': 0.1}, {'b': 1.7, 'error': 0.2}, {'f': -0.9, 'error': 0.3}]
+    exp = [{'f': -1.0, 'error': 0.06}, {'a': 0.4, 'error': 0.02}, {'c': 2.0, 'error': 0.0}]
+    return comp, exp
+
+
+def test_free_energy_index(series):
+    index = free_energy_index(series[0] + [{'a': 9.0, 'error': 9.0}])
+    assert (index == {'a': (0.5, 0.1), 'b': (1.7, 0.2), 'f': (-0.9, 0.3)})
+
+
+def test_common_compounds(series):
+    assert (common_compounds(*series) == ['a', 'f'])
+
+
+def test_align_free_energies(series):
+    names, values1, errors1, values2, errors2 = align_free_energies(*series)
+    assert (names == ['a', 'f'])
+    np.testing.assert_array_equal(values1, [0.5, -0.9])
+    np.testing.assert_array_equal(errors1, [0.1, 0.3])
+    np.testing.assert_array_equal(values2, [0.4, -1.0])
+    np.testing.assert_array_equal(errors2, [0.02, 0.06])
+    names, values1, errors1, values2, errors2 = align_free_energies(*series, compound_list=['f', 'a'])
+    np.testing.assert_array_equal(values2, [-1.0, 0.4])
+    with pytest.raises(KeyError):
+        align_free_energies(*series, compound_list=['b'])
+
+
+def test_free_energy_table(series):
+    table = FreeEnergyTable.from_dicts(series[0])
+    assert (table.names == ['a', 'b', 'f'])
+    np.testing.assert_array_equal(table.values, [0.5, 1.7, -0.9])
+    np.testing.assert_array_equal(table.errors, [0.1, 0.2, 0.3])
+    assert (len(table) == 3)
+    assert (table[-1]['f'] == -0.9)
+    assert (table[-1]['error'] == 0.3)
+    assert (table['b'] == {'b': 1.7, 'error': 0.2})
+    assert (table.value('b') == 1.7)
+    assert ('a' in table and 'c' not in table)
+    assert ({'a': 0.5, 'error': 0.1} in table)
+    assert (list(table) == series[0])
+    assert (table == series[0])
+    assert (table.to_dicts() == series[0])
+    assert (FreeEnergyTable.from_dicts(table) is table)
+    assert (table[1:].names == ['b', 'f'])
+    with pytest.raises(ValueError):
+        FreeEnergyTable(['a'], [1.0, 2.0], [0.0])
+
+
+def test_free_energy_table_read_only(series):
+    table = FreeEnergyTable.from_dicts(series[0])
+    with pytest.raises(TypeError):
+        for d in table:
+            d['a'] -= 1.0
+    with pytest.raises(TypeError):
+        table['b']['b'] = 0.0
+    np.testing.assert_array_equal(table.values, [0.5, 1.7, -0.9])
+    copies = table.to_dicts()
+    copies[0]['a'] -= 1.0
+    assert (table.value('a') == 0.5)
+    assert (copy.deepcopy(table[0]) == {'a': 0.5, 'error': 0.1})
+
+
+def test_align_tables(series):
+    names, values1, errors1, values2, errors2 = align_free_energies(FreeEnergyTable.from_dicts(series[0]), series[1])
+    assert (names == ['a', 'f'])
+    np.testing.assert_array_equal(values2, [0.4, -1.0])
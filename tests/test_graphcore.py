@@ -0,0 +1,101 @@
+import pytest
+import numpy as np
+import networkx as nx
+from networkanalysis.graphcore import *
+
+
+@pytest.fixture
+def graph():
+    return CompactGraph.from_edges(['b', 'a', 'b', 'c'], ['a', 'c', 'c', 'b'], [1.0, 2.0, 3.0, -3.0],
+                                   [0.1, 0.2, 0.3, 0.3])
+
+
+def test_interning(graph):
+    # nodes are numbered in order of first appearance
+    assert (graph.names == ['b', 'a', 'c'])
+    assert (graph.index == {'b': 0, 'a': 1, 'c': 2})
+    assert (graph.n_edges == 4)
+
+
+def test_csr_order(graph):
+    np.testing.assert_array_equal(graph.source, [0, 0, 1, 2])
+    np.testing.assert_array_equal(graph.sink, [1, 2, 2, 0])
+    np.testing.assert_array_equal(graph.indptr, [0, 2, 3, 4])
+    np.testing.assert_array_equal(graph.weight, [1.0, 3.0, 2.0, -3.0])
+
+
+def test_duplicate_edges():
+    graph = CompactGraph(['a', 'b'], [0, 0], [1, 1], [1.0, 2.0], [0.1, 0.2])
+    assert (graph.n_edges == 1)
+    assert (graph.weight[0] == 2.0)
+
+
+def test_edge_ids(graph):
+    np.testing.assert_array_equal(graph.edge_ids([0, 2, 1], [2, 0, 0]), [1, 3, -1])
+    assert (graph.has_edge('b', 'c'))
+    assert (not graph.has_edge('a', 'b'))
+    assert (not graph.has_edge('a', 'x'))
+
+
+def test_undirected_edges(graph):
+    # b-c is present in both directions and only selected once
+    np.testing.assert_array_equal(graph.undirected_edges(), [True, True, True, False])
+
+
+def test_adjacency_lists(graph):
+    adjacency = graph.adjacency_lists()
+    assert (adjacency[0] == [(1, 1.0, pytest.approx(0.01)), (2, 3.0, pytest.approx(0.09))])
+    assert (adjacency[1] == [(2, 2.0, pytest.approx(0.04))])
+
+
+def test_networkx_round_trip(graph):
+    g = graph.to_networkx()
+    assert (list(g.nodes()) == ['b', 'a', 'c'])
+    assert (g.edges['a', 'c'] == {'weight': 2.0, 'error': 0.2})
+    other = CompactGraph.from_networkx(g)
+    assert (other.names == graph.names)
+    np.testing.assert_array_equal(other.weight, graph.weight)
+
+
+def test_remove_nodes(graph):
+    smaller = graph.remove_nodes(['b'])
+    assert (smaller.names == ['a', 'c'])
+    assert (smaller.n_edges == 1)
+    assert (smaller.has_edge('a', 'c'))
+
+
+def test_symmetrize():
+    graph = CompactGraph.from_edges(['a', 'b', 'b'], ['b', 'a', 'c'], [1.0, -0.6, 2.0], [0.1, 0.1, 0.2])
+    sym = symmetrize(graph)
+    assert (sym.n_edges == 4)
+    ab, ba, bc, cb = sym.edge_ids([0, 1, 1, 2], [1, 0, 2, 1])
+    assert (pytest.approx(sym.weight[ab]) == 0.8)
+    assert (pytest.approx(sym.weight[ba]) == -0.8)
+    assert (pytest.approx(sym.error[ab]) == np.std([1.0, 0.6]) / np.sqrt(2.0))
+    assert (sym.error[ab] == sym.error[ba])
+    assert (pytest.approx(sym.hysteresis[ab]) == 0.4)
+    # single edges get a reverse edge with the same error
+    assert (sym.weight[cb] == -2.0)
+    assert (sym.error[cb] == 0.2)
+    assert (np.isnan(sym.hysteresis[bc]))
+
+
+def test_symmetrize_identical_simulations():
+    graph = CompactGraph.from_edges(['a', 'b'], ['b', 'a'], [1.0, -1.0], [0.1, 0.3])
+    sym = symmetrize(graph)
+    np.testing.assert_allclose(sym.error, [0.2, 0.2])
+    np.testing.assert_allclose(sym.hysteresis, [0.0, 0.0])
+
+
+def test_split_components():
+    graph = CompactGraph.from_edges(['a', 'c', 'b', 'd'], ['b', 'e', 'a', 'c'], [1.0, 2.0, -1.0, 0.5],
+                                    [0.1, 0.2, 0.1, 0.3])
+    n_components, labels = connected_components(graph)
+    assert (n_components == 2)
+    graphs = split_components(graph, labels)
+    assert (graphs[0].names == ['a', 'b'])
+    assert (graphs[1].names == ['c', 'e', 'd'])
+    assert (graphs[0].n_edges == 2 and graphs[1].n_edges == 2)
+    e = graphs[1].edge_ids([graphs[1].index['d']], [graphs[1].index['c']])[0]
+    assert (graphs[1].weight[e] == 0.5)
+    assert (graphs[1].error[e] == 0.3)
@@ -0,0 +1,133 @@
+import pytest
+import numpy as np
+from networkanalysis.graphcore import *
+from networkanalysis.loaders import *
+
+
+def test_read_edge_file():
+    graph = read_edge_file('tests/io/graph.csv')
+    assert ('FXR17' in graph.index)
+    assert (graph.n_edges == 48)
+
+
+def test_parse_edge_file(tmp_path):
+    f = tmp_path / 'edges.dat'
+    f.write_text('# header\na b 1.0 0.1 extra\nb c 2.0 0.2\n\nc a -3.0 0.3 # comment\nb c 2.5 0.2\n')
+    names, source, sink, weight, error = parse_edge_file(str(f), delimiter=None, chunksize=2)
+    assert (names == ['a', 'b', 'c'])
+    np.testing.assert_array_equal(source, [0, 1, 2, 1])
+    np.testing.assert_array_equal(sink, [1, 2, 0, 2])
+    np.testing.assert_array_equal(weight, [1.0, 2.0, -3.0, 2.5])
+    np.testing.assert_array_equal(error, [0.1, 0.2, 0.3, 0.2])
+
+
+def test_parse_edge_file_chunks(tmp_path):
+    rng = np.random.RandomState(5)
+    # names of different lengths, so chunks get different widths
+    compounds = ['c%s%d' % ('x' * (i % 13), i) for i in range(300)]
+    lines = []
+    expected = []
+    for i in range(5000):
+        if i % 997 == 0:
+            lines.extend(['# comment line\n'] * 3)
+        u, v = rng.randint(0, len(compounds), 2).tolist()
+        dg, error = rng.normal(), rng.uniform(0.0, 1.0)
+        lines.append('%s,%s,%r,%r\n' % (compounds[u], compounds[v], dg, error))
+        expected.append((compounds[u], compounds[v], dg, error))
+    f = tmp_path / 'large.csv'
+    f.write_text(''.join(lines))
+    order = []
+    for u, v, dg, error in expected:
+        for n in (u, v):
+            if n not in order:
+                order.append(n)
+    for chunksize in (3, 1000, 4096, 100000):
+        names, source, sink, weight, error = parse_edge_file(str(f), chunksize=chunksize)
+        assert (names == order)
+        assert ([names[i] for i in source.tolist()] == [e[0] for e in expected])
+        assert ([names[i] for i in sink.tolist()] == [e[1] for e in expected])
+        np.testing.assert_array_equal(weight, [e[2] for e in expected])
+        np.testing.assert_array_equal(error, [e[3] for e in expected])
+
+
+def test_read_edge_file_like_networkx():
+    import networkx as nx
+    graph = read_edge_file('tests/io/graph.csv')
+    reference = symmetrize(CompactGraph.from_networkx(nx.read_edgelist(
+        'tests/io/graph.csv', delimiter=',', create_using=nx.DiGraph(), data=(('weight', float), ('error', float)))))
+    assert (graph.names == reference.names)
+    np.testing.assert_array_equal(graph.source, reference.source)
+    np.testing.assert_array_equal(graph.sink, reference.sink)
+    np.testing.assert_allclose(graph.weight, reference.weight)
+    np.testing.assert_allclose(graph.error, reference.error)
+
+
+def test_merge_replicates():
+    first = CompactGraph.from_edges(['a', 'b'], ['b', 'c'], [1.0, 2.0], [0.3, 0.1])
+    second = CompactGraph.from_edges(['a', 'c'], ['b', 'd'], [2.0, 1.0], [0.4, 0.1])
+    third = CompactGraph.from_edges(['a'], ['b'], [3.0], [0.0])
+    merged = merge_replicates([first, second, third])
+    assert (merged.names == ['a', 'b', 'c', 'd'])
+    assert (merged.n_edges == 3)
+    ab = merged.edge_ids([0], [1])[0]
+    assert (pytest.approx(merged.weight[ab]) == 2.0)
+    assert (pytest.approx(merged.error[ab]) == 0.5 / 3)
+    # independent of the order of the replicates
+    reordered = merge_replicates([third, second, first])
+    assert (pytest.approx(reordered.weight[reordered.edge_ids([reordered.index['a']], [reordered.index['b']])[0]])
+            == 2.0)
+
+
+def test_merge_two_replicates_like_add_data():
+    from networkanalysis.networkanalysis import PerturbationGraph
+    pG = PerturbationGraph()
+    pG.populate_pert_graph('tests/io/graph.csv')
+    pG.add_data_to_graph('tests/io/summary_r1.csv')
+    merged = load_edge_files(['tests/io/graph.csv', 'tests/io/summary_r1.csv'])
+    for u, v, w in pG.graph.edges(data=True):
+        e = merged.edge_ids([merged.index[u]], [merged.index[v]])[0]
+        assert (pytest.approx(merged.weight[e]) == w['weight'])
+        assert (pytest.approx(merged.error[e]) == w['error'])
+
+
+def test_load_edge_files_parallel():
+    files = ['tests/io/graph.csv', 'tests/io/summary_r1.csv', 'tests/io/test_graph1.csv']
+    serial = load_edge_files(files)
+    parallel = load_edge_files(files, jobs=2)
+    assert (serial.names == parallel.names)
+    np.testing.assert_array_equal(serial.weight, parallel.weight)
+    np.testing.assert_array_equal(serial.error, parallel.error)
+
+
+def test_edge_accumulator():
+    rng = np.random.RandomState(3)
+    weight = rng.normal(size=(5, 2))
+    error = rng.uniform(0.1, 0.5, size=(5, 2))
+    replicates = EdgeAccumulator()
+    reordered = EdgeAccumulator()
+    for i in range(5):
+        replicates.add(['a', 'b', 'c'], [0, 1], [1, 2], weight[i], error[i])
+        reordered.add(['c', 'b', 'a'], [2, 1], [1, 0], weight[4 - i], error[4 - i])
+    assert (replicates.names == ['a', 'b', 'c'])
+    np.testing.assert_array_equal(replicates.count, [5, 5])
+    np.testing.assert_allclose(replicates.mean, weight.mean(axis=0))
+    np.testing.assert_allclose(replicates.std, weight.std(axis=0))
+    np.testing.assert_allclose(replicates.standard_error, np.sqrt((error ** 2).sum(axis=0)) / 5)
+    # edges are ordered by the node ids of the accumulator, which differ for the reordered names
+    np.testing.assert_allclose(reordered.mean[::-1], replicates.mean)
+    np.testing.assert_allclose(reordered.std[::-1], replicates.std)
+
+
+def test_edge_accumulator_remove_nodes():
+    replicates = EdgeAccumulator()
+    replicates.add(['a', 'b', 'c'], [0, 1, 0], [1, 2, 2], [1.0, 2.0, 3.0], [0.1, 0.2, 0.3])
+    replicates.add(['a', 'b'], [0], [1], [3.0], [0.1])
+    replicates.remove_nodes(['b'])
+    assert (replicates.names == ['a', 'c'])
+    np.testing.assert_array_equal(replicates.source, [0])
+    np.testing.assert_array_equal(replicates.sink, [1])
+    np.testing.assert_array_equal(replicates.count, [1])
+    replicates.add(['c', 'a', 'b'], [1, 0], [0, 2], [5.0, 1.0], [0.3, 0.1])
+    assert (replicates.names == ['a', 'c', 'b'])
+    assert (replicates.count[replicates.source == 0][0] == 2)
+    assert (pytest.approx(replicates.mean[replicates.source == 0][0]) == 4.0)
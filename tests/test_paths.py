@@ -0,0 +1,108 @@
+import pytest
+import numpy as np
+import networkx as nx
+from networkanalysis.paths import *
+
+
+@pytest.fixture
+def square():
+    # 0 -> 1 -> 3 and 0 -> 2 -> 3 plus the diagonal 1 - 2, every edge present in both directions
+    edges = [(0, 1, 1.0, 0.1), (1, 3, 2.0, 0.2), (0, 2, 0.5, 0.1), (2, 3, 2.4, 0.1), (1, 2, -0.4, 0.3)]
+    adjacency = [[] for i in range(4)]
+    for u, v, w, e in edges:
+        adjacency[u].append((v, w, e ** 2))
+        adjacency[v].append((u, -w, e ** 2))
+    return edges, adjacency
+
+
+def test_path_accumulator():
+    acc = PathAccumulator(2)
+    for dg, e2 in [(1.0, 0.04), (2.0, 0.01), (4.0, 0.09)]:
+        acc.add(1, dg, e2)
+    assert (acc.count[1] == 3)
+    assert (acc.count[0] == 0)
+    assert (pytest.approx(acc.mean[1]) == np.mean([1.0, 2.0, 4.0]))
+    assert (pytest.approx(acc.std[1]) == np.std([1.0, 2.0, 4.0]))
+    inv_err = 1.0 / np.sqrt([0.04, 0.01, 0.09])
+    weights = inv_err / np.sum(inv_err)
+    assert (pytest.approx(acc.weighted_mean[1]) == np.sum(weights * [1.0, 2.0, 4.0]))
+    assert (pytest.approx(acc.weighted_error[1]) == np.sqrt(np.sum(weights * [0.04, 0.01, 0.09])))
+
+
+def test_stream_simple_paths(square):
+    edges, adjacency = square
+    g = nx.DiGraph()
+    for u, nbrs in enumerate(adjacency):
+        for v, w, e2 in nbrs:
+            g.add_edge(u, v, weight=w)
+    acc = PathAccumulator(4)
+    stream_simple_paths(adjacency, 0, 3, acc)
+    sums = [nx.path_weight(g, p, 'weight') for p in nx.all_simple_paths(g, 0, 3)]
+    assert (acc.count[3] == len(sums) == 4)
+    assert (pytest.approx(acc.mean[3]) == np.mean(sums))
+    assert (pytest.approx(acc.std[3]) == np.std(sums))
+    # paths ending elsewhere are not accumulated
+    assert (acc.count[1] == 0)
+
+
+def test_stream_simple_paths_source(square):
+    edges, adjacency = square
+    acc = PathAccumulator(4)
+    stream_simple_paths(adjacency, 2, 2, acc)
+    assert (acc.count[2] == 1)
+    assert (acc.mean[2] == 0.0)
+
+
+def test_stream_simple_paths_single_source(square):
+    edges, adjacency = square
+    single = PathAccumulator(4)
+    stream_simple_paths(adjacency, 0, None, single)
+    separate = PathAccumulator(4)
+    for n in range(4):
+        stream_simple_paths(adjacency, 0, n, separate)
+    np.testing.assert_array_equal(single.count, separate.count)
+    np.testing.assert_allclose(single.mean, separate.mean)
+    np.testing.assert_allclose(single.std, separate.std)
+    np.testing.assert_allclose(single.weighted_mean[1:], separate.weighted_mean[1:])
+    np.testing.assert_allclose(single.weighted_error[1:], separate.weighted_error[1:])
+
+
+@pytest.mark.parametrize('max_length', [(1), (2), (3)])
+def test_stream_simple_paths_max_length(square, max_length):
+    edges, adjacency = square
+    acc = PathAccumulator(4)
+    stream_simple_paths(adjacency, 0, None, acc, max_length=max_length)
+    g = nx.DiGraph()
+    for u, nbrs in enumerate(adjacency):
+        for v, w, e2 in nbrs:
+            g.add_edge(u, v)
+    for n in range(1, 4):
+        assert (acc.count[n] == len(list(nx.all_simple_paths(g, 0, n, cutoff=max_length))))
+
+
+def test_lowest_error_paths(square):
+    edges, adjacency = square
+    g = nx.DiGraph()
+    for u, nbrs in enumerate(adjacency):
+        for v, w, e2 in nbrs:
+            g.add_edge(u, v, weight=w, error2=e2)
+    expected = [nx.path_weight(g, p, 'error2') for p in nx.shortest_simple_paths(g, 0, 3, weight='error2')]
+    paths = list(lowest_error_paths(adjacency, 0, 3))
+    assert (len(paths) == len(expected))
+    np.testing.assert_allclose([p[2] for p in paths], expected)
+    for p, dg, error2 in paths:
+        assert (p[0] == 0 and p[-1] == 3)
+        assert (pytest.approx(dg) == nx.path_weight(g, p, 'weight'))
+
+
+def test_lowest_error_paths_max_length(square):
+    edges, adjacency = square
+    g = nx.DiGraph()
+    for u, nbrs in enumerate(adjacency):
+        for v, w, e2 in nbrs:
+            g.add_edge(u, v, error2=e2)
+    expected = sorted(nx.path_weight(g, p, 'error2') for p in nx.all_simple_paths(g, 0, 3, cutoff=2))
+    paths = list(lowest_error_paths(adjacency, 0, 3, max_length=2))
+    np.testing.assert_allclose([p[2] for p in paths], expected)
+    assert (all(len(p[0]) <= 3 for p in paths))
+    assert (list(lowest_error_paths(adjacency, 0, 3, max_length=1)) == [])
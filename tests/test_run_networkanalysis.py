@@ -67,6 +67,34 @@ def test_do_not_save_data(executable, graph_file):
     assert (b'#FREE ENERGIES ARE:' in stdout)
 
 
+def test_bounded_paths(executable, graph_file):
+    cmd = [sys.executable, executable, graph_file, '--target_compound=FXR17', '--max_path_length=4',
+           '--k_best_paths=3']
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = p.communicate()
+    assert (p.returncode == 0)
+    assert (b'No path with at most 4 edges from FXR17 to FXR102' in stderr)
+
+
+def test_several_files(executable, graph_file):
+    second_file = os.path.join(os.getcwd(), 'tests', 'io', 'summary_r1.csv')
+    cmd = [sys.executable, executable, graph_file, second_file, '--target_compound=FXR17', '--jobs=2']
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = p.communicate()
+    assert (p.returncode == 0)
+    assert (b'#FREE ENERGIES ARE:' in stdout)
+
+
+def test_cache_dir(executable, graph_file, tmp_path):
+    cmd = [sys.executable, executable, graph_file, '--target_compound=FXR17', '--cache_dir=' + str(tmp_path)]
+    for i in range(2):
+        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = p.communicate()
+        assert (p.returncode == 0)
+        assert (b'#FREE ENERGIES ARE:' in stdout)
+    assert (len(list(tmp_path.glob('*.npz'))) == 1)
+
+
 def test_statistics(executable, graph_file):
     filename = os.path.join(os.getcwd(), 'tests', 'io', 'ic50_exp.dat')
     cmd = [sys.executable, executable, graph_file, '--target_compound=FXR17', '--stats', '--experiments=' + filename]
@@ -77,6 +105,16 @@ def test_statistics(executable, graph_file):
     assert (output in stdout)
 
 
+def test_statistics_tolerance(executable, graph_file):
+    filename = os.path.join(os.getcwd(), 'tests', 'io', 'ic50_exp.dat')
+    cmd = [sys.executable, executable, graph_file, '--target_compound=FXR17', '--stats', '--experiments=' + filename,
+           '--stats_tolerance=0.01']
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = p.communicate()
+    assert (p.returncode == 0)
+    assert (b'bootstrap samples used' in stdout)
+
+
 def test_jupyter_notebook(executable, graph_file):
     try:
         JupyterNotebookCreator
@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+from networkanalysis.solvers import *
+
+
+@pytest.fixture
+def solver():
+    # square 0-1-3-2-0 with the diagonal 1-2
+    source = [0, 1, 0, 2, 1]
+    sink = [1, 3, 2, 3, 2]
+    weight = [1.0, 2.0, 0.5, 2.4, -0.4]
+    error = [0.1, 0.2, 0.1, 0.1, 0.3]
+    return NetworkSolver(4, source, sink, weight, error, reference=0)
+
+
+def test_covariance_block(solver):
+    solver.solve()
+    block = solver.covariance_block([3, 1], [2, 0, 3], max_bytes=8)
+    dense = solver.covariance
+    np.testing.assert_allclose(block, dense[np.ix_([3, 1], [2, 0, 3])])
+    assert (np.all(block[:, 1] == 0.0))
+
+
+def test_covariance_entries(solver):
+    entries = solver.covariance_entries([1, 2, 3, 3], [3, 2, 1, 0], max_bytes=8)
+    np.testing.assert_allclose(entries, solver.covariance[[1, 2, 3, 3], [3, 2, 1, 0]])
+    np.testing.assert_allclose(solver.variances, np.diag(solver.covariance))
+
+
+def test_update_edges(solver):
+    solver.solve()
+    # change the 1-3 edge, given in reverse, and add an edge 0-3
+    free_energies = solver.update_edges([3, 0], [1, 3], [-2.2, 3.1], [0.3, 0.2])
+    full = NetworkSolver(4, [0, 1, 0, 2, 1, 0], [1, 3, 2, 3, 2, 3], [1.0, 2.2, 0.5, 2.4, -0.4, 3.1],
+                         [0.1, 0.3, 0.1, 0.1, 0.3, 0.2], reference=0)
+    np.testing.assert_allclose(free_energies, full.solve(), atol=1e-12)
+    np.testing.assert_allclose(solver.errors, full.errors, atol=1e-12)
+    np.testing.assert_allclose(solver.covariance_block([1, 2], [3]), full.covariance[[1, 2]][:, [3]], atol=1e-12)
+    with pytest.raises(ValueError):
+        solver.update_edges([0], [4], [1.0], [0.1])
+
+
+def test_edge_influence(solver):
+    free_energies = solver.solve()
+    shifts, residuals, leverages = solver.edge_influence(max_bytes=64)
+    for e in range(5):
+        keep = np.arange(5) != e
+        left_out = NetworkSolver(4, solver.source[keep], solver.sink[keep], np.array([1.0, 2.0, 0.5, 2.4, -0.4])[keep],
+                                 np.array([0.1, 0.2, 0.1, 0.1, 0.3])[keep], reference=0)
+        np.testing.assert_allclose(shifts[e], left_out.solve() - free_energies, atol=1e-12)
+    # the sum of the leverages is the number of free nodes
+    assert (pytest.approx(np.sum(leverages)) == 3.0)
+
+
+def test_compound_influence(solver):
+    free_energies = solver.solve()
+    shifts = solver.compound_influence([1, 3], max_bytes=64)
+    # without node 1 the edges 0-2 and 2-3 remain, without node 3 only the triangle 0-1-2
+    without_1 = NetworkSolver(3, [0, 1], [1, 2], [0.5, 2.4], [0.1, 0.1], reference=0).solve()
+    np.testing.assert_allclose(shifts[0, [0, 2, 3]], without_1 - free_energies[[0, 2, 3]], atol=1e-12)
+    without_3 = NetworkSolver(3, [0, 0, 1], [1, 2, 2], [1.0, 0.5, -0.4], [0.1, 0.1, 0.3], reference=0).solve()
+    np.testing.assert_allclose(shifts[1, :3], without_3 - free_energies[:3], atol=1e-12)
+    assert (np.isnan(shifts[0, 1]) and np.isnan(shifts[1, 3]))
+    assert (np.all(np.isnan(solver.compound_influence([2], disconnecting=[True]))))
+    with pytest.raises(ValueError):
+        solver.compound_influence([0])
@@ -84,6 +84,45 @@ def test_statistics(stats):
     assert (pytest.approx(mue) == 0.0)
 
 
+def test_seed(stats):
+    exp_dat = [{'a': 0.5, 'error': 0.02}, {'b': 1.7, 'error': 0.2}, {'f': -0.9, 'error': 0.06}]
+    comp = [{'a': 0.4, 'error': 0.5}, {'b': 1.2, 'error': 0.4}, {'f': -0.5, 'error': 0.6}]
+    stats.generate_statistics(comp, exp_dat, repeats=100, seed=1)
+    R = stats._R
+    other = freeEnergyStats()
+    other.generate_statistics(comp, exp_dat, repeats=100, seed=1, n_jobs=2)
+    np.testing.assert_array_equal(R, other._R)
+    assert (stats.tau_confidence.tolist() == other.tau_confidence.tolist())
+
+
+def test_streaming(stats):
+    exp_dat = [{'a': 0.5, 'error': 0.02}, {'b': 1.7, 'error': 0.2}, {'f': -0.9, 'error': 0.06}, {'g': 0.1, 'error': 0.1}]
+    comp = [{'a': 0.4, 'error': 0.5}, {'b': 1.2, 'error': 0.4}, {'f': -0.5, 'error': 0.6}, {'g': 0.3, 'error': 0.2}]
+    stats.generate_statistics(comp, exp_dat, repeats=20000, seed=1)
+    streaming = freeEnergyStats()
+    streaming.generate_statistics(comp, exp_dat, repeats=20000, seed=1, mode='streaming')
+    assert (streaming._R is None)
+    assert (pytest.approx(streaming.R_mean) == stats.R_mean)
+    assert (pytest.approx(streaming.mue_std) == stats.mue_std)
+    np.testing.assert_allclose(streaming.mue_confidence, stats.mue_confidence, atol=0.01)
+    np.testing.assert_allclose(streaming.R2_confidence, stats.R2_confidence, atol=0.01)
+    with pytest.raises(ValueError):
+        stats.generate_statistics(comp, exp_dat, mode='sketch')
+
+
+@pytest.mark.parametrize('mode', ['exact', 'streaming'])
+def test_adaptive(stats, mode):
+    exp_dat = [{'a': 0.5, 'error': 0.02}, {'b': 1.7, 'error': 0.2}, {'f': -0.9, 'error': 0.06}, {'g': 0.1, 'error': 0.1}]
+    comp = [{'a': 0.4, 'error': 0.5}, {'b': 1.2, 'error': 0.4}, {'f': -0.5, 'error': 0.6}, {'g': 0.3, 'error': 0.2}]
+    stats.generate_statistics(comp, exp_dat, repeats=50000, seed=2, mode=mode, tolerance=0.01)
+    assert (stats.repeats_used < 50000)
+    assert (stats.repeats_used % 1000 == 0)
+    if mode == 'exact':
+        assert (len(stats._R) == stats.repeats_used)
+    stats.generate_statistics(comp, exp_dat, repeats=3000, seed=2, mode=mode, tolerance=1e-9)
+    assert (stats.repeats_used == 3000)
+
+
 def test_calculate_predictive_index(stats):
     exp_dat = [{'a': 0.5, 'error': 0.02}, {'b': 1.7, 'error': 0.2}, {'f': -0.9, 'error': 0.06}]
     comp = [{'a': 0.5, 'error': 0.02}, {'b': 1.7, 'error': 0.2}, {'f': -0.9, 'error': 0.06}]